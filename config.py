@@ -29,6 +29,60 @@ class Config:
     
     # Gemini AI
     GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
+    GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'gemini-pro')
+    # Max concurrent Gemini calls per process
+    GEMINI_MAX_CONCURRENCY = int(os.getenv('GEMINI_MAX_CONCURRENCY', '4'))
+    
+    # Paper Generation
+    # 'auto': deterministic selector first, Gemini only when targets are missed
+    # 'ai': always try Gemini first; 'deterministic': never call Gemini
+    # 'hedged': race Gemini against the selector within PAPER_HEDGE_BUDGET_SECONDS
+    PAPER_GENERATION_ENGINE = os.getenv('PAPER_GENERATION_ENGINE', 'auto')
+    # Max coverage deviation (percentage points of marks) accepted per dimension
+    PAPER_COVERAGE_TOLERANCE = float(os.getenv('PAPER_COVERAGE_TOLERANCE', '10'))
+    # Seconds a generation may spend before Gemini is abandoned for the local result
+    PAPER_GENERATION_BUDGET_SECONDS = float(os.getenv('PAPER_GENERATION_BUDGET_SECONDS', '25'))
+    # Engine 'hedged': seconds to wait for Gemini before returning the local selection
+    PAPER_HEDGE_BUDGET_SECONDS = float(os.getenv('PAPER_HEDGE_BUDGET_SECONDS', '8'))
+    # Multi-set generation: max sets per request, default questions shared by any two sets
+    PAPER_MAX_SETS = int(os.getenv('PAPER_MAX_SETS', '6'))
+    PAPER_SET_MAX_OVERLAP = int(os.getenv('PAPER_SET_MAX_OVERLAP', '0'))
+    # Rotation of questions used by the course's latest papers:
+    # 'exclude', 'downweight' (rank behind unused questions) or 'off'
+    PAPER_ROTATION_POLICY = os.getenv('PAPER_ROTATION_POLICY', 'exclude')
+    PAPER_ROTATION_WINDOW = int(os.getenv('PAPER_ROTATION_WINDOW', '5'))
+    # Seconds a cached course question bank is served before an incremental refresh
+    PAPER_BANK_CACHE_TTL = float(os.getenv('PAPER_BANK_CACHE_TTL', '30'))
+    # Gemini prompt encoding: 'compact' (default), 'attributes' or 'full'
+    PAPER_PROMPT_MODE = os.getenv('PAPER_PROMPT_MODE', 'compact')
+    # Chunked bank fetch: rows per request (<= PostgREST max-rows) and parallel requests
+    BANK_FETCH_CHUNK_SIZE = int(os.getenv('BANK_FETCH_CHUNK_SIZE', '1000'))
+    BANK_FETCH_WORKERS = int(os.getenv('BANK_FETCH_WORKERS', '4'))
+    # Background generation jobs: SQLite job table, threads per process,
+    # max queued/running jobs per process, seconds before a running job is resumed,
+    # and seconds between scans for jobs orphaned by a dead worker process
+    GENERATION_JOB_DB = os.getenv('GENERATION_JOB_DB', 'generation_jobs.sqlite3')
+    GENERATION_JOB_WORKERS = int(os.getenv('GENERATION_JOB_WORKERS', '2'))
+    GENERATION_JOB_MAX_PENDING = int(os.getenv('GENERATION_JOB_MAX_PENDING', '20'))
+    GENERATION_JOB_STALE_SECONDS = int(os.getenv('GENERATION_JOB_STALE_SECONDS', '900'))
+    GENERATION_JOB_RESUME_SECONDS = int(os.getenv('GENERATION_JOB_RESUME_SECONDS', '30'))
+    # Max cached generation results per process (0 disables the result cache)
+    GENERATION_RESULT_CACHE_SIZE = int(os.getenv('GENERATION_RESULT_CACHE_SIZE', '256'))
+    # Seconds a faculty's identical re-submission returns the paper it just saved (0 disables)
+    GENERATION_IDEMPOTENCY_SECONDS = float(os.getenv('GENERATION_IDEMPOTENCY_SECONDS', '30'))
+    # Max rendered finalized-paper responses cached per process (0 disables)
+    PAPER_RESPONSE_CACHE_SIZE = int(os.getenv('PAPER_RESPONSE_CACHE_SIZE', '128'))
+    # Max question ids per batched question usage lookup (bounded by the PostgREST URL length)
+    QUESTION_USAGE_MAX_IDS = int(os.getenv('QUESTION_USAGE_MAX_IDS', '500'))
+    # PDF/DOCX exports: disk cache directory and size, and render processes per
+    # web process. Uncached exports answer 202 at once; a positive wait lets the
+    # request hold for up to that many seconds for the render to finish
+    PAPER_RENDER_CACHE_DIR = os.getenv('PAPER_RENDER_CACHE_DIR', 'render_cache')
+    PAPER_RENDER_CACHE_MAX_MB = int(os.getenv('PAPER_RENDER_CACHE_MAX_MB', '200'))
+    PAPER_RENDER_WORKERS = int(os.getenv('PAPER_RENDER_WORKERS', '2'))
+    PAPER_RENDER_WAIT_SECONDS = float(os.getenv('PAPER_RENDER_WAIT_SECONDS', '0'))
+    # Max seats per streamed variant / answer key request
+    PAPER_VARIANT_MAX_SEATS = int(os.getenv('PAPER_VARIANT_MAX_SEATS', '20000'))
     
     # CORS
     CORS_ORIGINS = os.getenv('CORS_ORIGINS', 'http://localhost:3000').split(',')
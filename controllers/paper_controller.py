@@ -1,13 +1,20 @@
 """
 Paper controller for Academic ERP Backend.
 """
-from flask import request, g, current_app
+from flask import request, g, current_app, Response, stream_with_context, send_file
 from services.paper_generation_service import PaperGenerationService
+from services.generation_job_service import GenerationJobService
+from services.paper_revision_service import PaperRevisionService
+from services.paper_export_service import PaperExportService
+from services.paper_variant_service import PaperVariantService, VARIANT_FORMATS, VARIANT_CONTENTS
 from middlewares.auth import auth_required, faculty_only
 from utils.responses import (
-    success_response, created_response, not_found_response, paginated_response
+    success_response, created_response, not_found_response, paginated_response,
+    error_response, forbidden_response, sse_event
+)
+from utils.validators import (
+    validate_paper_generation_params, validate_blueprint_params, validate_positive_int
 )
-from utils.validators import validate_paper_generation_params
 
 class PaperController:
     """Controller for question paper generation endpoints."""
@@ -24,13 +31,96 @@ class PaperController:
             current_app.logger.warning(f"Validation failed for paper generation: {errors}")
             return {'success': False, 'errors': errors}, 400
             
-        paper, error = PaperGenerationService.generate_paper(data, g.user.id)
+        paper, error = PaperGenerationService.generate_paper(data, g.user['id'])
         if error:
             current_app.logger.error(f"Paper generation failed: {error}")
             return {'success': False, 'message': error}, 400
             
-        current_app.logger.info(f"Paper generated successfully: ID {paper.id}")
-        return created_response(paper.to_dict(include_questions=True), message='Paper generated successfully')
+        current_app.logger.info(f"Paper generated successfully: ID {paper['id']}")
+        return created_response(paper, message='Paper generated successfully')
+
+    @staticmethod
+    @auth_required
+    @faculty_only
+    def check_feasibility():
+        data = request.get_json() or {}
+
+        is_valid, errors = validate_blueprint_params(data)
+        if not is_valid:
+            return {'success': False, 'errors': errors}, 400
+
+        report, error = PaperGenerationService.check_feasibility(data)
+        if error:
+            return {'success': False, 'message': error}, 400
+        return success_response(report)
+
+    @staticmethod
+    @auth_required
+    @faculty_only
+    def generate_paper_sets():
+        data = request.get_json()
+
+        is_valid, errors = validate_paper_generation_params(data)
+        if not is_valid:
+            return {'success': False, 'errors': errors}, 400
+
+        papers, error = PaperGenerationService.generate_paper_sets(data, g.user['id'])
+        if error:
+            current_app.logger.error(f"Paper set generation failed: {error}")
+            return {'success': False, 'message': error}, 400
+
+        current_app.logger.info(f"Paper sets generated successfully: IDs {[p['id'] for p in papers]}")
+        return created_response({'papers': papers}, message='Paper sets generated successfully')
+
+    @staticmethod
+    @auth_required
+    @faculty_only
+    def stream_generate_paper():
+        data = request.get_json()
+
+        is_valid, errors = validate_paper_generation_params(data)
+        if not is_valid:
+            return {'success': False, 'errors': errors}, 400
+
+        faculty_id = g.user['id']
+        current_app.logger.info(f"Streaming paper generation for course_id: {data.get('course_id')}")
+
+        def events():
+            for event, payload in PaperGenerationService.stream_paper(data, faculty_id):
+                yield sse_event(event, payload)
+
+        return Response(
+            stream_with_context(events()),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+
+    @staticmethod
+    @auth_required
+    @faculty_only
+    def submit_generation_job():
+        data = request.get_json()
+
+        is_valid, errors = validate_paper_generation_params(data)
+        if not is_valid:
+            return {'success': False, 'errors': errors}, 400
+
+        job, error = GenerationJobService.submit_job(data, g.user['id'])
+        if error:
+            return error_response(error, error_type='Too Many Requests', status_code=429)
+
+        current_app.logger.info(f"Queued paper generation job {job['id']} for course_id: {data.get('course_id')}")
+        return success_response(job, message='Paper generation queued', status_code=202)
+
+    @staticmethod
+    @auth_required
+    def get_generation_job(job_id):
+        job = GenerationJobService.get_job(job_id)
+        if not job:
+            return not_found_response('Generation Job')
+        if g.user_role != 'admin' and job['faculty_id'] != g.user['id']:
+            return forbidden_response('You can only view your own generation jobs')
+        return success_response(job)
 
     @staticmethod
     @auth_required
@@ -40,7 +130,7 @@ class PaperController:
         limit = request.args.get('limit', 20, type=int)
         
         # Admins can see all, faculty see their own (or course specific)
-        faculty_id = None if g.user_role == 'admin' else g.user.id
+        faculty_id = None if g.user_role == 'admin' else g.user['id']
         
         result = PaperGenerationService.get_history(course_id, faculty_id, page, limit)
         return paginated_response(
@@ -50,7 +140,94 @@ class PaperController:
     @staticmethod
     @auth_required
     def get_paper(paper_id):
-        result = PaperGenerationService.get_paper_details(paper_id)
+        rendered = PaperGenerationService.get_rendered_paper(paper_id)
+        if not rendered:
+            return not_found_response('Question Paper')
+
+        body, etag = rendered
+        response = Response(body, mimetype='application/json')
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response.make_conditional(request)
+
+    @staticmethod
+    @auth_required
+    def export_paper(paper_id):
+        fmt = request.args.get('format', 'pdf').lower()
+        result, error = PaperExportService.export_paper(paper_id, fmt)
+        if error:
+            return {'success': False, 'message': error}, 400
+        if not result:
+            return not_found_response('Question Paper')
+        if result['status'] != 'ready':
+            body, status = success_response(result, message='Paper is being rendered, retry shortly', status_code=202)
+            return body, status, {'Retry-After': '2'}
+
+        response = send_file(
+            result['path'], mimetype=result['mimetype'], as_attachment=True,
+            download_name=result['filename'], etag=result['etag'], conditional=True
+        )
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+
+    @staticmethod
+    @auth_required
+    @faculty_only
+    def stream_paper_variants(paper_id):
+        args = request.args
+        fmt = args.get('format', 'ndjson').lower()
+        content = args.get('content', 'keys').lower()
+        max_seats = current_app.config.get('PAPER_VARIANT_MAX_SEATS', 20000)
+
+        errors = []
+        if not validate_positive_int(args.get('seat_count')):
+            errors.append('seat_count is required and must be a positive integer')
+        elif int(args['seat_count']) > max_seats:
+            errors.append(f'seat_count must be at most {max_seats}')
+        if not validate_positive_int(args.get('start_seat', 1)):
+            errors.append('start_seat must be a positive integer')
+        if args.get('seed') is not None and not validate_positive_int(args['seed'], allow_zero=True):
+            errors.append('seed must be a non-negative integer')
+        if fmt not in VARIANT_FORMATS:
+            errors.append(f'format must be one of: {", ".join(VARIANT_FORMATS)}')
+        if content not in VARIANT_CONTENTS:
+            errors.append(f'content must be one of: {", ".join(VARIANT_CONTENTS)}')
+        if errors:
+            return {'success': False, 'errors': errors}, 400
+
+        seed = int(args['seed']) if args.get('seed') is not None else None
+        plan = PaperVariantService.build_plan(paper_id, seed)
+        if not plan:
+            return not_found_response('Question Paper')
+
+        start_seat, seat_count = int(args.get('start_seat', 1)), int(args['seat_count'])
+        current_app.logger.info(
+            f"Streaming {seat_count} {content} of paper {paper_id} (seed {plan.seed}) as {fmt}"
+        )
+        filename = f"paper-{paper_id}-{content}-{start_seat}-{start_seat + seat_count - 1}.{fmt}"
+        return Response(
+            stream_with_context(PaperVariantService.stream(plan, start_seat, seat_count, fmt, content)),
+            mimetype=VARIANT_FORMATS[fmt],
+            headers={
+                'Content-Disposition': f'attachment; filename="{filename}"',
+                'X-Variant-Seed': str(plan.seed),
+                'X-Accel-Buffering': 'no'
+            }
+        )
+
+    @staticmethod
+    @auth_required
+    @faculty_only
+    def swap_questions(paper_id):
+        data = request.get_json() or {}
+        ids = data.get('generated_question_ids')
+        if not isinstance(ids, list) or not ids or not all(validate_positive_int(i) for i in ids):
+            return {'success': False, 'errors': ['generated_question_ids must be a non-empty array of ids']}, 400
+
+        faculty_id = None if g.user_role == 'admin' else g.user['id']
+        result, error = PaperRevisionService.swap_questions(paper_id, ids, faculty_id)
+        if error:
+            return {'success': False, 'message': error}, 400
         if not result:
             return not_found_response('Question Paper')
-        return success_response(result)
+        return success_response(result, message='Questions swapped successfully')
@@ -1,14 +1,23 @@
 """
 Question controller for Academic ERP Backend.
 """
-from flask import request, g
+from flask import request, g, current_app
 from services.question_service import QuestionService
 from middlewares.auth import auth_required, faculty_only
 from utils.responses import (
     success_response, created_response, deleted_response,
     paginated_response, not_found_response
 )
-from utils.validators import validate_question_data
+from utils.validators import validate_question_data, validate_positive_int
+
+
+def _get_tag_args(name):
+    """Read a tag filter given as repeated and/or comma-separated query args."""
+    tags = []
+    for value in request.args.getlist(name):
+        tags.extend(t.strip() for t in value.split(',') if t.strip())
+    return tags or None
+
 
 class QuestionController:
     """Controller for question bank management endpoints."""
@@ -21,11 +30,14 @@ class QuestionController:
         course_id = request.args.get('course_id', type=int)
         unit_id = request.args.get('unit_id', type=int)
         search_query = request.args.get('search')
+        tags_any = _get_tag_args('tags_any')
+        tags_all = _get_tag_args('tags_all')
         
         result = QuestionService.get_questions(
             page=page, per_page=per_page, 
             course_id=course_id, unit_id=unit_id,
-            search_query=search_query
+            search_query=search_query,
+            tags_any=tags_any, tags_all=tags_all
         )
         return paginated_response(
             result['items'], result['page'], result['per_page'], result['total']
@@ -39,6 +51,27 @@ class QuestionController:
             return not_found_response('Question')
         return success_response(question.to_dict(include_relations=True))
 
+    @staticmethod
+    @auth_required
+    @faculty_only
+    def get_question_usage(id):
+        usage = QuestionService.get_question_usage([id])
+        return success_response(usage[0])
+
+    @staticmethod
+    @auth_required
+    @faculty_only
+    def get_questions_usage():
+        data = request.get_json() or {}
+        ids = data.get('question_ids')
+        max_ids = current_app.config.get('QUESTION_USAGE_MAX_IDS', 500)
+        if not isinstance(ids, list) or not ids or not all(validate_positive_int(i) for i in ids):
+            return {'success': False, 'errors': ['question_ids must be a non-empty array of ids']}, 400
+        if len(ids) > max_ids:
+            return {'success': False, 'errors': [f'At most {max_ids} question_ids per request']}, 400
+
+        return success_response(QuestionService.get_question_usage(ids))
+
     @staticmethod
     @auth_required
     @faculty_only
@@ -48,7 +81,7 @@ class QuestionController:
         if not is_valid:
             return {'success': False, 'errors': errors}, 400
             
-        question = QuestionService.create_question(data, g.user.id)
+        question = QuestionService.create_question(data, g.user['id'])
         return created_response(question.to_dict())
 
     @staticmethod
@@ -78,7 +111,7 @@ class QuestionController:
         if not isinstance(data, list):
             return {'success': False, 'message': 'Data must be a list of questions'}, 400
             
-        success, result = QuestionService.bulk_upload(data, g.user.id)
+        success, result = QuestionService.bulk_upload(data, g.user['id'])
         if not success:
             return {'success': False, 'errors': result}, 400
             
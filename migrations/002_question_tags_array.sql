@@ -0,0 +1,86 @@
+-- Migrate questions.tags from a comma-separated TEXT column to TEXT[]
+-- Compatible with Supabase PostgreSQL
+--
+-- Run the steps in order. Steps 1-3 are safe to run while the application is
+-- serving traffic. Step 4 swaps the columns in a short transaction and must be
+-- deployed together with the application release that writes tags as arrays.
+-- Step 5 builds the GIN index without blocking writes (CREATE INDEX CONCURRENTLY
+-- cannot run inside a transaction block, run it on its own in the SQL Editor).
+
+-- Helper: split a comma-separated tag string into a trimmed, non-empty array
+CREATE OR REPLACE FUNCTION split_question_tags(raw TEXT)
+RETURNS TEXT[]
+LANGUAGE sql
+IMMUTABLE
+AS $$
+    SELECT COALESCE(
+        ARRAY(
+            SELECT btrim(t)
+            FROM unnest(string_to_array(raw, ',')) AS t
+            WHERE btrim(t) <> ''
+        ),
+        '{}'::TEXT[]
+    );
+$$;
+
+-- 1. Add the new array column (nullable, no default => metadata-only change, no table rewrite)
+ALTER TABLE questions ADD COLUMN IF NOT EXISTS tag_list TEXT[];
+
+-- 2. Keep tag_list in sync with writes that happen while the backfill is running
+CREATE OR REPLACE FUNCTION questions_sync_tag_list()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    NEW.tag_list := split_question_tags(NEW.tags);
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_questions_sync_tag_list ON questions;
+CREATE TRIGGER trg_questions_sync_tag_list
+    BEFORE INSERT OR UPDATE OF tags ON questions
+    FOR EACH ROW EXECUTE FUNCTION questions_sync_tag_list();
+
+-- 3. Backfill existing rows in id-ranged batches, committing after each batch
+--    so row locks are short-lived and the table stays writable.
+CREATE OR REPLACE PROCEDURE backfill_question_tags(batch_size INTEGER DEFAULT 1000)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    last_id INTEGER := 0;
+    max_id INTEGER;
+BEGIN
+    SELECT COALESCE(MAX(id), 0) INTO max_id FROM questions;
+
+    WHILE last_id < max_id LOOP
+        UPDATE questions
+        SET tag_list = split_question_tags(tags)
+        WHERE id > last_id
+          AND id <= last_id + batch_size
+          AND tag_list IS NULL;
+
+        last_id := last_id + batch_size;
+        COMMIT;
+    END LOOP;
+END;
+$$;
+
+CALL backfill_question_tags(1000);
+
+-- 4. Swap columns (short ACCESS EXCLUSIVE lock, no data rewrite)
+BEGIN;
+DROP TRIGGER IF EXISTS trg_questions_sync_tag_list ON questions;
+UPDATE questions SET tag_list = split_question_tags(tags) WHERE tag_list IS NULL;
+ALTER TABLE questions RENAME COLUMN tags TO tags_legacy;
+ALTER TABLE questions RENAME COLUMN tag_list TO tags;
+ALTER TABLE questions ALTER COLUMN tags SET DEFAULT '{}'::TEXT[];
+COMMIT;
+
+-- 5. GIN index for tags_any (&&) and tags_all (@>) filters
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_question_tags ON questions USING GIN (tags);
+
+-- 6. Cleanup once the release has been verified
+-- ALTER TABLE questions DROP COLUMN tags_legacy;
+-- DROP FUNCTION IF EXISTS questions_sync_tag_list();
+-- DROP PROCEDURE IF EXISTS backfill_question_tags(INTEGER);
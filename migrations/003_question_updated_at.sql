@@ -0,0 +1,24 @@
+-- Maintain questions.updated_at on every write so the per-course question
+-- bank snapshot cache can refresh incrementally from an updated_at watermark.
+-- Compatible with Supabase PostgreSQL
+-- The watermark index is built without blocking writes (CREATE INDEX
+-- CONCURRENTLY cannot run inside a transaction block, run it on its own in
+-- the SQL Editor).
+
+CREATE OR REPLACE FUNCTION set_updated_at()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    NEW.updated_at := CURRENT_TIMESTAMP;
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_questions_updated_at ON questions;
+CREATE TRIGGER trg_questions_updated_at
+    BEFORE UPDATE ON questions
+    FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+
+-- Delta fetches: WHERE course_id = ? AND updated_at >= ?
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_question_course_updated ON questions(course_id, updated_at);
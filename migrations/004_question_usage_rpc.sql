@@ -0,0 +1,60 @@
+-- Set-based question usage bookkeeping.
+-- One call per generated paper increments usage_count and stamps
+-- last_used_at for every selected question (ids may repeat across sets).
+-- Compatible with Supabase PostgreSQL (callable as supabase.rpc('record_question_usage'))
+-- The usage watermark index is built without blocking writes (CREATE INDEX
+-- CONCURRENTLY cannot run inside a transaction block, run it on its own in
+-- the SQL Editor).
+
+CREATE OR REPLACE FUNCTION record_question_usage(question_ids INTEGER[])
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    updated INTEGER;
+BEGIN
+    UPDATE questions q
+    SET usage_count = COALESCE(q.usage_count, 0) + used.uses,
+        last_used_at = CURRENT_TIMESTAMP
+    FROM (
+        SELECT id, COUNT(*) AS uses
+        FROM unnest(question_ids) AS id
+        GROUP BY id
+    ) AS used
+    WHERE q.id = used.id;
+
+    GET DIAGNOSTICS updated = ROW_COUNT;
+    RETURN updated;
+END;
+$$;
+
+-- Usage bookkeeping is not a change to the question itself: keep updated_at
+-- unchanged when only usage_count / last_used_at move. last_used_at serves
+-- as the usage watermark instead: QuestionBankCache refreshes rows whose
+-- updated_at or last_used_at moved past its watermark, so the bank snapshot
+-- version (and the generation results cached under it) still follows usage.
+CREATE OR REPLACE FUNCTION set_question_updated_at()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF (to_jsonb(NEW) - 'usage_count' - 'last_used_at' - 'updated_at')
+       = (to_jsonb(OLD) - 'usage_count' - 'last_used_at' - 'updated_at') THEN
+        NEW.updated_at := OLD.updated_at;
+    ELSE
+        NEW.updated_at := CURRENT_TIMESTAMP;
+    END IF;
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_questions_updated_at ON questions;
+CREATE TRIGGER trg_questions_updated_at
+    BEFORE UPDATE ON questions
+    FOR EACH ROW EXECUTE FUNCTION set_question_updated_at();
+
+-- The trigger function of 003 is no longer referenced
+DROP FUNCTION IF EXISTS set_updated_at();
+
+-- Usage watermark lookups: WHERE course_id = ? AND last_used_at >= ?
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_question_course_last_used ON questions(course_id, last_used_at);
@@ -0,0 +1,54 @@
+-- Atomic paper persistence.
+-- create_generated_papers inserts one or more paper headers, their
+-- generated_questions rows and the question usage updates in a single
+-- transaction and returns the saved papers with their question rows.
+-- Compatible with Supabase PostgreSQL (callable as supabase.rpc('create_generated_papers'))
+--
+-- papers: JSONB array of {"paper": {generated_papers columns},
+--                         "questions": [{question_id, section, question_number, marks}]}
+
+CREATE OR REPLACE FUNCTION create_generated_papers(papers JSONB)
+RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    entry JSONB;
+    new_paper generated_papers;
+    saved JSONB := '[]'::JSONB;
+BEGIN
+    FOR entry IN SELECT value FROM jsonb_array_elements(papers)
+    LOOP
+        INSERT INTO generated_papers (
+            course_id, faculty_id, title, exam_type, academic_year, semester,
+            total_marks, generation_params, question_count, unit_coverage,
+            bloom_distribution, difficulty_distribution, status
+        )
+        SELECT
+            p.course_id, p.faculty_id, p.title, p.exam_type, p.academic_year, p.semester,
+            p.total_marks, p.generation_params, p.question_count, p.unit_coverage,
+            p.bloom_distribution, p.difficulty_distribution, COALESCE(p.status, 'draft')
+        FROM jsonb_populate_record(NULL::generated_papers, entry->'paper') AS p
+        RETURNING * INTO new_paper;
+
+        INSERT INTO generated_questions (paper_id, question_id, section, question_number, marks)
+        SELECT new_paper.id, q.question_id, q.section, q.question_number, q.marks
+        FROM jsonb_to_recordset(COALESCE(entry->'questions', '[]'::JSONB))
+            AS q(question_id INTEGER, section VARCHAR, question_number INTEGER, marks INTEGER);
+
+        PERFORM record_question_usage(ARRAY(
+            SELECT (q->>'question_id')::INTEGER
+            FROM jsonb_array_elements(COALESCE(entry->'questions', '[]'::JSONB)) AS q
+        ));
+
+        saved := saved || jsonb_build_array(
+            to_jsonb(new_paper) || jsonb_build_object('questions', (
+                SELECT COALESCE(jsonb_agg(to_jsonb(gq) ORDER BY gq.id), '[]'::JSONB)
+                FROM generated_questions gq
+                WHERE gq.paper_id = new_paper.id
+            ))
+        );
+    END LOOP;
+
+    RETURN saved;
+END;
+$$;
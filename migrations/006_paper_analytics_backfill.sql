@@ -0,0 +1,74 @@
+-- Backfill precomputed paper analytics.
+-- New papers get question_count, unit_coverage, bloom_distribution and
+-- difficulty_distribution at write time; this fills them for existing
+-- papers in batches of paper ids. Each distribution maps a unit number,
+-- Bloom level name or difficulty name ('Unassigned' when missing) to its
+-- percentage of the paper's marks.
+-- Compatible with Supabase PostgreSQL
+
+CREATE OR REPLACE PROCEDURE backfill_paper_analytics(batch_size INTEGER DEFAULT 500)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    last_id INTEGER := 0;
+    max_id INTEGER;
+BEGIN
+    SELECT COALESCE(MAX(id), 0) INTO max_id FROM generated_papers;
+
+    WHILE last_id < max_id LOOP
+        WITH paper_rows AS (
+            SELECT gq.paper_id,
+                   gq.marks,
+                   COALESCE(u.unit_number::TEXT, 'Unassigned') AS unit_key,
+                   COALESCE(b.name, 'Unassigned') AS bloom_key,
+                   COALESCE(d.name, 'Unassigned') AS difficulty_key
+            FROM generated_questions gq
+            JOIN questions q ON q.id = gq.question_id
+            LEFT JOIN units u ON u.id = q.unit_id
+            LEFT JOIN bloom_levels b ON b.id = q.bloom_level_id
+            LEFT JOIN difficulty_levels d ON d.id = q.difficulty_id
+            WHERE gq.paper_id > last_id
+              AND gq.paper_id <= last_id + batch_size
+        ),
+        totals AS (
+            SELECT paper_id, COUNT(*) AS question_count, SUM(marks) AS marks
+            FROM paper_rows
+            GROUP BY paper_id
+        ),
+        shares AS (
+            SELECT r.paper_id, f.facet, f.key,
+                   ROUND(100.0 * SUM(r.marks) / NULLIF(t.marks, 0), 2) AS share
+            FROM paper_rows r
+            JOIN totals t ON t.paper_id = r.paper_id
+            CROSS JOIN LATERAL (VALUES
+                ('unit', r.unit_key),
+                ('bloom', r.bloom_key),
+                ('difficulty', r.difficulty_key)
+            ) AS f(facet, key)
+            GROUP BY r.paper_id, f.facet, f.key, t.marks
+        ),
+        facets AS (
+            SELECT paper_id,
+                   jsonb_object_agg(key, share) FILTER (WHERE facet = 'unit') AS unit_coverage,
+                   jsonb_object_agg(key, share) FILTER (WHERE facet = 'bloom') AS bloom_distribution,
+                   jsonb_object_agg(key, share) FILTER (WHERE facet = 'difficulty') AS difficulty_distribution
+            FROM shares
+            GROUP BY paper_id
+        )
+        UPDATE generated_papers p
+        SET question_count = t.question_count,
+            unit_coverage = f.unit_coverage,
+            bloom_distribution = f.bloom_distribution,
+            difficulty_distribution = f.difficulty_distribution
+        FROM totals t
+        JOIN facets f ON f.paper_id = t.paper_id
+        WHERE p.id = t.paper_id
+          AND p.question_count IS NULL;
+
+        last_id := last_id + batch_size;
+        COMMIT;
+    END LOOP;
+END;
+$$;
+
+CALL backfill_paper_analytics(500);
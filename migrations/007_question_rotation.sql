@@ -0,0 +1,32 @@
+-- Server-side question rotation.
+-- recently_used_questions returns, in one query, every question used by
+-- the last N generated papers of a course together with how many papers
+-- ago it was last used (1 = the most recent paper).
+-- Compatible with Supabase PostgreSQL (callable as supabase.rpc('recently_used_questions'))
+-- The lookup indexes are built without blocking writes (CREATE INDEX
+-- CONCURRENTLY cannot run inside a transaction block, run them on their own
+-- in the SQL Editor).
+
+-- Question -> papers lookups (rotation, usage history)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_generated_question_question ON generated_questions(question_id);
+
+-- Latest papers of a course
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_generated_paper_course_id ON generated_papers(course_id, id DESC);
+
+CREATE OR REPLACE FUNCTION recently_used_questions(p_course_id INTEGER, p_paper_window INTEGER DEFAULT 5)
+RETURNS TABLE(question_id INTEGER, papers_ago INTEGER)
+LANGUAGE sql
+STABLE
+AS $$
+    WITH recent AS (
+        SELECT id, ROW_NUMBER() OVER (ORDER BY id DESC)::INTEGER AS papers_ago
+        FROM generated_papers
+        WHERE course_id = p_course_id
+        ORDER BY id DESC
+        LIMIT p_paper_window
+    )
+    SELECT gq.question_id, MIN(recent.papers_ago)::INTEGER
+    FROM generated_questions gq
+    JOIN recent ON recent.id = gq.paper_id
+    GROUP BY gq.question_id;
+$$;
@@ -0,0 +1,188 @@
+-- Immutable rendered snapshot of finalized papers.
+-- generated_papers.paper_snapshot holds the paper as it was finalized
+-- (sections, question texts, marks, unit, CO, Bloom and difficulty), so
+-- later edits to the question bank do not change historical papers and
+-- detail views read a single row instead of joining live questions.
+-- Swaps re-capture only the swapped entries (patch_paper_snapshot).
+-- The JSONB column is TOAST-compressed with lz4 (PostgreSQL 14+).
+-- Compatible with Supabase PostgreSQL
+--
+-- Snapshot shape:
+--   {"version": 1, "captured_at": ...,
+--    "sections": [{"section", "marks", "questions": [generated_questions row
+--                  + "questions": {question columns, units, course_outcomes,
+--                                  bloom_levels, difficulty_levels}]}]}
+
+ALTER TABLE generated_papers ADD COLUMN IF NOT EXISTS paper_snapshot JSONB;
+ALTER TABLE generated_papers ALTER COLUMN paper_snapshot SET COMPRESSION lz4;
+
+-- Snapshot entry of one generated_questions row with its question as it is now
+CREATE OR REPLACE FUNCTION paper_snapshot_entry(p_generated_question_id INTEGER)
+RETURNS JSONB
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT to_jsonb(gq) || jsonb_build_object('questions',
+        (to_jsonb(q) - 'usage_count' - 'last_used_at') || jsonb_build_object(
+            'units', CASE WHEN u.id IS NULL THEN NULL
+                          ELSE jsonb_build_object('unit_number', u.unit_number) END,
+            'course_outcomes', CASE WHEN co.id IS NULL THEN NULL
+                                    ELSE jsonb_build_object('co_number', co.co_number) END,
+            'bloom_levels', CASE WHEN b.id IS NULL THEN NULL
+                                 ELSE jsonb_build_object('name', b.name, 'level', b.level) END,
+            'difficulty_levels', CASE WHEN d.id IS NULL THEN NULL
+                                      ELSE jsonb_build_object('name', d.name) END
+        )
+    )
+    FROM generated_questions gq
+    JOIN questions q ON q.id = gq.question_id
+    LEFT JOIN units u ON u.id = q.unit_id
+    LEFT JOIN course_outcomes co ON co.id = q.co_id
+    LEFT JOIN bloom_levels b ON b.id = q.bloom_level_id
+    LEFT JOIN difficulty_levels d ON d.id = q.difficulty_id
+    WHERE gq.id = p_generated_question_id;
+$$;
+
+CREATE OR REPLACE FUNCTION build_paper_snapshot(p_paper_id INTEGER)
+RETURNS JSONB
+LANGUAGE sql
+STABLE
+AS $$
+    WITH sections AS (
+        SELECT section,
+               MIN(id) AS first_id,
+               SUM(marks) AS marks,
+               jsonb_agg(paper_snapshot_entry(id) ORDER BY question_number) AS questions
+        FROM generated_questions
+        WHERE paper_id = p_paper_id
+        GROUP BY section
+    )
+    SELECT jsonb_build_object(
+        'version', 1,
+        'captured_at', CURRENT_TIMESTAMP,
+        'sections', COALESCE(
+            -- Blueprint order: question rows are inserted section by section
+            (SELECT jsonb_agg(jsonb_build_object('section', section, 'marks', marks, 'questions', questions)
+                              ORDER BY first_id)
+             FROM sections),
+            '[]'::JSONB
+        )
+    );
+$$;
+
+-- Re-capture only the given generated_questions entries of a stored
+-- snapshot (after a swap); every other entry keeps its captured content
+CREATE OR REPLACE FUNCTION patch_paper_snapshot(p_paper_id INTEGER, p_generated_question_ids INTEGER[])
+RETURNS VOID
+LANGUAGE sql
+AS $$
+    UPDATE generated_papers p
+    SET paper_snapshot = p.paper_snapshot || jsonb_build_object(
+        'revised_at', CURRENT_TIMESTAMP,
+        'sections', (
+            SELECT COALESCE(jsonb_agg(
+                s.section || jsonb_build_object('questions', (
+                    SELECT COALESCE(jsonb_agg(
+                        CASE WHEN (q.entry->>'id')::INTEGER = ANY(p_generated_question_ids)
+                             THEN paper_snapshot_entry((q.entry->>'id')::INTEGER)
+                             ELSE q.entry END
+                        ORDER BY q.n
+                    ), '[]'::JSONB)
+                    FROM jsonb_array_elements(s.section->'questions') WITH ORDINALITY AS q(entry, n)
+                ))
+                ORDER BY s.n
+            ), '[]'::JSONB)
+            FROM jsonb_array_elements(p.paper_snapshot->'sections') WITH ORDINALITY AS s(section, n)
+        )
+    )
+    WHERE p.id = p_paper_id
+      AND p.paper_snapshot IS NOT NULL;
+$$;
+
+-- Paper detail in one call: the paper columns plus its questions, read from
+-- the stored snapshot or, for papers without one, built from live rows
+CREATE OR REPLACE FUNCTION get_paper_detail(p_paper_id INTEGER)
+RETURNS JSONB
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT (to_jsonb(p) - 'paper_snapshot') || jsonb_build_object(
+        'snapshot_at', p.paper_snapshot->'captured_at',
+        'questions', (
+            SELECT COALESCE(jsonb_agg(q.entry ORDER BY s.n, q.n), '[]'::JSONB)
+            FROM jsonb_array_elements(
+                COALESCE(p.paper_snapshot, build_paper_snapshot(p.id))->'sections'
+            ) WITH ORDINALITY AS s(section, n),
+            jsonb_array_elements(s.section->'questions') WITH ORDINALITY AS q(entry, n)
+        )
+    )
+    FROM generated_papers p
+    WHERE p.id = p_paper_id;
+$$;
+
+-- Capture the full snapshot of a finalized paper (at finalization)
+CREATE OR REPLACE FUNCTION refresh_paper_snapshot(p_paper_id INTEGER)
+RETURNS VOID
+LANGUAGE sql
+AS $$
+    UPDATE generated_papers
+    SET paper_snapshot = build_paper_snapshot(id)
+    WHERE id = p_paper_id
+      AND status = 'finalized';
+$$;
+
+-- create_generated_papers (005) now captures the snapshot of finalized
+-- papers in the same transaction as their question rows
+CREATE OR REPLACE FUNCTION create_generated_papers(papers JSONB)
+RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    entry JSONB;
+    new_paper generated_papers;
+    saved JSONB := '[]'::JSONB;
+BEGIN
+    FOR entry IN SELECT value FROM jsonb_array_elements(papers)
+    LOOP
+        INSERT INTO generated_papers (
+            course_id, faculty_id, title, exam_type, academic_year, semester,
+            total_marks, generation_params, question_count, unit_coverage,
+            bloom_distribution, difficulty_distribution, status
+        )
+        SELECT
+            p.course_id, p.faculty_id, p.title, p.exam_type, p.academic_year, p.semester,
+            p.total_marks, p.generation_params, p.question_count, p.unit_coverage,
+            p.bloom_distribution, p.difficulty_distribution, COALESCE(p.status, 'draft')
+        FROM jsonb_populate_record(NULL::generated_papers, entry->'paper') AS p
+        RETURNING * INTO new_paper;
+
+        INSERT INTO generated_questions (paper_id, question_id, section, question_number, marks)
+        SELECT new_paper.id, q.question_id, q.section, q.question_number, q.marks
+        FROM jsonb_to_recordset(COALESCE(entry->'questions', '[]'::JSONB))
+            AS q(question_id INTEGER, section VARCHAR, question_number INTEGER, marks INTEGER);
+
+        PERFORM record_question_usage(ARRAY(
+            SELECT (q->>'question_id')::INTEGER
+            FROM jsonb_array_elements(COALESCE(entry->'questions', '[]'::JSONB)) AS q
+        ));
+
+        PERFORM refresh_paper_snapshot(new_paper.id);
+
+        saved := saved || jsonb_build_array(
+            to_jsonb(new_paper) || jsonb_build_object('questions', (
+                SELECT COALESCE(jsonb_agg(to_jsonb(gq) ORDER BY gq.id), '[]'::JSONB)
+                FROM generated_questions gq
+                WHERE gq.paper_id = new_paper.id
+            ))
+        );
+    END LOOP;
+
+    RETURN saved;
+END;
+$$;
+
+-- Capture snapshots of already finalized papers (from the current bank)
+UPDATE generated_papers
+SET paper_snapshot = build_paper_snapshot(id)
+WHERE status = 'finalized'
+  AND paper_snapshot IS NULL;
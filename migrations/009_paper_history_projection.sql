@@ -0,0 +1,106 @@
+-- Lightweight paper history.
+-- History lists read a fixed projection of generated_papers (title,
+-- exam_type, total_marks, question_count, status, source_engine,
+-- created_at) instead of every column. source_engine holds
+-- generation_params->>'source' ('ai' or 'deterministic'; NULL for papers
+-- generated before the source was recorded) so listing never reads the
+-- generation_params JSONB.
+-- The covering indexes serve the faculty and course history pages,
+-- newest first, with index-only scans.
+-- Compatible with Supabase PostgreSQL (PostgreSQL 12+)
+--
+-- Run the steps in order. Step 1 adds a plain nullable column (a catalog
+-- change, no table rewrite). Step 2 writes source_engine for new papers.
+-- Step 3 backfills existing papers in batches of paper ids, one short
+-- transaction per batch. Step 4 builds the indexes without blocking writes
+-- (CREATE INDEX CONCURRENTLY cannot run inside a transaction block, run
+-- each statement on its own in the SQL Editor).
+
+-- Step 1
+ALTER TABLE generated_papers ADD COLUMN IF NOT EXISTS source_engine VARCHAR(20);
+
+-- Step 2: create_generated_papers (008) stores source_engine, taken from
+-- the payload or else from generation_params->>'source'
+CREATE OR REPLACE FUNCTION create_generated_papers(papers JSONB)
+RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    entry JSONB;
+    new_paper generated_papers;
+    saved JSONB := '[]'::JSONB;
+BEGIN
+    FOR entry IN SELECT value FROM jsonb_array_elements(papers)
+    LOOP
+        INSERT INTO generated_papers (
+            course_id, faculty_id, title, exam_type, academic_year, semester,
+            total_marks, generation_params, question_count, unit_coverage,
+            bloom_distribution, difficulty_distribution, status, source_engine
+        )
+        SELECT
+            p.course_id, p.faculty_id, p.title, p.exam_type, p.academic_year, p.semester,
+            p.total_marks, p.generation_params, p.question_count, p.unit_coverage,
+            p.bloom_distribution, p.difficulty_distribution, COALESCE(p.status, 'draft'),
+            COALESCE(p.source_engine, p.generation_params->>'source')
+        FROM jsonb_populate_record(NULL::generated_papers, entry->'paper') AS p
+        RETURNING * INTO new_paper;
+
+        INSERT INTO generated_questions (paper_id, question_id, section, question_number, marks)
+        SELECT new_paper.id, q.question_id, q.section, q.question_number, q.marks
+        FROM jsonb_to_recordset(COALESCE(entry->'questions', '[]'::JSONB))
+            AS q(question_id INTEGER, section VARCHAR, question_number INTEGER, marks INTEGER);
+
+        PERFORM record_question_usage(ARRAY(
+            SELECT (q->>'question_id')::INTEGER
+            FROM jsonb_array_elements(COALESCE(entry->'questions', '[]'::JSONB)) AS q
+        ));
+
+        PERFORM refresh_paper_snapshot(new_paper.id);
+
+        saved := saved || jsonb_build_array(
+            to_jsonb(new_paper) || jsonb_build_object('questions', (
+                SELECT COALESCE(jsonb_agg(to_jsonb(gq) ORDER BY gq.id), '[]'::JSONB)
+                FROM generated_questions gq
+                WHERE gq.paper_id = new_paper.id
+            ))
+        );
+    END LOOP;
+
+    RETURN saved;
+END;
+$$;
+
+-- Step 3
+CREATE OR REPLACE PROCEDURE backfill_paper_source_engine(batch_size INTEGER DEFAULT 5000)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    last_id INTEGER := 0;
+    max_id INTEGER;
+BEGIN
+    SELECT COALESCE(MAX(id), 0) INTO max_id FROM generated_papers;
+
+    WHILE last_id < max_id LOOP
+        UPDATE generated_papers
+        SET source_engine = generation_params->>'source'
+        WHERE id > last_id
+          AND id <= last_id + batch_size
+          AND source_engine IS NULL
+          AND generation_params->>'source' IS NOT NULL;
+
+        last_id := last_id + batch_size;
+        COMMIT;
+    END LOOP;
+END;
+$$;
+
+CALL backfill_paper_source_engine(5000);
+
+-- Step 4
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_generated_paper_faculty_history
+    ON generated_papers(faculty_id, created_at DESC)
+    INCLUDE (id, course_id, title, exam_type, total_marks, question_count, status, source_engine);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_generated_paper_course_history
+    ON generated_papers(course_id, created_at DESC)
+    INCLUDE (id, faculty_id, title, exam_type, total_marks, question_count, status, source_engine);
@@ -0,0 +1,50 @@
+-- Atomic question swaps.
+-- swap_paper_questions replaces generated_questions rows of a paper, records
+-- the usage of the new questions, stores the refreshed analytics columns and
+-- generation_params (deviation report) and re-captures the swapped entries
+-- of the paper snapshot (the rest stays as captured) in a single
+-- transaction, so a failed swap never leaves a half-revised paper.
+-- Compatible with Supabase PostgreSQL (callable as supabase.rpc('swap_paper_questions'))
+--
+-- p_rows:  JSONB array of {"id": generated_questions id, "question_id": new question}
+-- p_paper: JSONB object with question_count, unit_coverage, bloom_distribution,
+--          difficulty_distribution and generation_params
+
+CREATE OR REPLACE FUNCTION swap_paper_questions(p_paper_id INTEGER, p_rows JSONB, p_paper JSONB)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    swapped INTEGER;
+BEGIN
+    UPDATE generated_questions gq
+    SET question_id = r.question_id
+    FROM jsonb_to_recordset(p_rows) AS r(id INTEGER, question_id INTEGER)
+    WHERE gq.id = r.id
+      AND gq.paper_id = p_paper_id;
+
+    GET DIAGNOSTICS swapped = ROW_COUNT;
+    IF swapped <> jsonb_array_length(p_rows) THEN
+        RAISE EXCEPTION 'Swapped rows do not all belong to paper %', p_paper_id;
+    END IF;
+
+    PERFORM record_question_usage(ARRAY(
+        SELECT (r->>'question_id')::INTEGER FROM jsonb_array_elements(p_rows) AS r
+    ));
+
+    UPDATE generated_papers
+    SET question_count = (p_paper->>'question_count')::INTEGER,
+        unit_coverage = p_paper->'unit_coverage',
+        bloom_distribution = p_paper->'bloom_distribution',
+        difficulty_distribution = p_paper->'difficulty_distribution',
+        generation_params = p_paper->'generation_params',
+        updated_at = CURRENT_TIMESTAMP
+    WHERE id = p_paper_id;
+
+    PERFORM patch_paper_snapshot(p_paper_id, ARRAY(
+        SELECT (r->>'id')::INTEGER FROM jsonb_array_elements(p_rows) AS r
+    ));
+
+    RETURN swapped;
+END;
+$$;
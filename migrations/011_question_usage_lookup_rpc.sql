@@ -0,0 +1,42 @@
+-- Question usage lookup in one call.
+-- question_usage returns one row per requested question (in request order,
+-- unused questions included) with the papers it appeared in aggregated
+-- into a JSONB array, newest first. Results stay one row per question, so
+-- they are never cut by PostgREST's max-rows.
+-- Compatible with Supabase PostgreSQL (callable as supabase.rpc('question_usage'))
+-- Uses idx_generated_question_question (007).
+
+CREATE OR REPLACE FUNCTION question_usage(p_question_ids INTEGER[])
+RETURNS TABLE(question_id INTEGER, paper_count INTEGER, papers JSONB)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT ids.id,
+           COUNT(used.paper_id)::INTEGER,
+           COALESCE(
+               jsonb_agg(jsonb_build_object(
+                   'paper_id', used.paper_id,
+                   'title', used.title,
+                   'exam_type', used.exam_type,
+                   'status', used.status,
+                   'created_at', used.created_at,
+                   'section', used.section,
+                   'question_number', used.question_number
+               ) ORDER BY used.created_at DESC NULLS LAST, used.paper_id DESC)
+               FILTER (WHERE used.paper_id IS NOT NULL),
+               '[]'::JSONB
+           )
+    FROM unnest(p_question_ids) WITH ORDINALITY AS ids(id, n)
+    LEFT JOIN LATERAL (
+        -- First slot of the question in each paper
+        SELECT DISTINCT ON (gq.paper_id)
+               gq.paper_id, gq.section, gq.question_number,
+               p.title, p.exam_type, p.status, p.created_at
+        FROM generated_questions gq
+        JOIN generated_papers p ON p.id = gq.paper_id
+        WHERE gq.question_id = ids.id
+        ORDER BY gq.paper_id, gq.id
+    ) AS used ON TRUE
+    GROUP BY ids.id, ids.n
+    ORDER BY ids.n;
+$$;
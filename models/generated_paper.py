@@ -45,7 +45,11 @@ class GeneratedPaper(db.Model):
     bloom_distribution = db.Column(db.JSON)  # Actual distribution
     difficulty_distribution = db.Column(db.JSON)  # Actual distribution
     
+    # Immutable rendered paper captured at finalization (see migrations/008_paper_snapshot.sql)
+    paper_snapshot = db.Column(db.JSON)
+    
     status = db.Column(db.String(20), default='draft')  # draft, finalized, used
+    source_engine = db.Column(db.String(20))  # ai, deterministic (generation_params['source'])
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -54,6 +58,12 @@ class GeneratedPaper(db.Model):
         db.Index('idx_paper_course', 'course_id'),
         db.Index('idx_paper_faculty', 'faculty_id'),
         db.Index('idx_paper_created', 'created_at'),
+        db.Index('idx_generated_paper_faculty_history', 'faculty_id', db.text('created_at DESC'),
+                 postgresql_include=['id', 'course_id', 'title', 'exam_type', 'total_marks',
+                                     'question_count', 'status', 'source_engine']),
+        db.Index('idx_generated_paper_course_history', 'course_id', db.text('created_at DESC'),
+                 postgresql_include=['id', 'faculty_id', 'title', 'exam_type', 'total_marks',
+                                     'question_count', 'status', 'source_engine']),
     )
     
     # Relationships
@@ -80,6 +90,7 @@ class GeneratedPaper(db.Model):
             'bloom_distribution': self.bloom_distribution,
             'difficulty_distribution': self.difficulty_distribution,
             'status': self.status,
+            'source_engine': self.source_engine,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
@@ -29,7 +29,7 @@ class Question(db.Model):
     
     # Metadata
     image_url = db.Column(db.String(500))
-    tags = db.Column(db.Text)  # Comma-separated tags
+    tags = db.Column(db.ARRAY(db.Text), default=list)  # GIN-indexed tag array
     usage_count = db.Column(db.Integer, default=0)  # Track how many times used
     last_used_at = db.Column(db.DateTime)
     
@@ -46,6 +46,7 @@ class Question(db.Model):
         db.Index('idx_question_difficulty', 'difficulty_id'),
         db.Index('idx_question_marks', 'marks'),
         db.Index('idx_question_status', 'status'),
+        db.Index('idx_question_tags', 'tags', postgresql_using='gin'),
     )
     
     # Relationships
@@ -74,7 +75,7 @@ class Question(db.Model):
             'options': self.options,
             'correct_answer': self.correct_answer,
             'image_url': self.image_url,
-            'tags': self.tags.split(',') if self.tags else [],
+            'tags': list(self.tags) if self.tags else [],
             'usage_count': self.usage_count,
             'last_used_at': self.last_used_at.isoformat() if self.last_used_at else None,
             'status': self.status,
@@ -7,5 +7,13 @@ from controllers.paper_controller import PaperController
 paper_bp = Blueprint('paper', __name__)
 
 paper_bp.route('/generate', methods=['POST'])(PaperController.generate_paper)
+paper_bp.route('/generate/stream', methods=['POST'])(PaperController.stream_generate_paper)
+paper_bp.route('/generate/sets', methods=['POST'])(PaperController.generate_paper_sets)
+paper_bp.route('/feasibility', methods=['POST'])(PaperController.check_feasibility)
 paper_bp.route('/history', methods=['GET'])(PaperController.get_history)
 paper_bp.route('/<int:paper_id>', methods=['GET'])(PaperController.get_paper)
+paper_bp.route('/<int:paper_id>/export', methods=['GET'])(PaperController.export_paper)
+paper_bp.route('/<int:paper_id>/variants', methods=['GET'])(PaperController.stream_paper_variants)
+paper_bp.route('/jobs', methods=['POST'])(PaperController.submit_generation_job)
+paper_bp.route('/jobs/<job_id>', methods=['GET'])(PaperController.get_generation_job)
+paper_bp.route('/<int:paper_id>/swap', methods=['POST'])(PaperController.swap_questions)
@@ -12,3 +12,5 @@ question_bp.route('/<int:id>', methods=['GET'])(QuestionController.get_question)
 question_bp.route('/<int:id>', methods=['PUT'])(QuestionController.update_question)
 question_bp.route('/<int:id>', methods=['DELETE'])(QuestionController.delete_question)
 question_bp.route('/bulk-upload', methods=['POST'])(QuestionController.bulk_upload)
+question_bp.route('/usage', methods=['POST'])(QuestionController.get_questions_usage)
+question_bp.route('/<int:id>/usage', methods=['GET'])(QuestionController.get_question_usage)
@@ -5,10 +5,14 @@ from services.admin_service import AdminService
 from services.faculty_service import FacultyService
 from services.question_service import QuestionService
 from services.paper_generation_service import PaperGenerationService
+from services.generation_job_service import GenerationJobService
+from services.paper_export_service import PaperExportService
 
 __all__ = [
     'AdminService',
     'FacultyService', 
     'QuestionService',
-    'PaperGenerationService'
+    'PaperGenerationService',
+    'GenerationJobService',
+    'PaperExportService'
 ]
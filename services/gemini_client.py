@@ -0,0 +1,117 @@
+"""
+Shared Gemini client for Academic ERP Backend.
+
+The SDK is configured once per process and every generation reuses the
+same model client. Concurrent model calls are bounded by a semaphore and
+each call carries a deadline taken from the remaining generation budget,
+so a slow or hung model call cannot pin a request worker; callers treat
+DeadlineExceeded like quota exhaustion and fall back to the local engine.
+"""
+import logging
+import threading
+import time
+
+import google.ai.generativelanguage as glm
+import google.generativeai as genai
+from google.api_core.exceptions import DeadlineExceeded
+from google.generativeai.client import get_default_generative_client
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+_client = None
+_model_name = None
+_semaphore = None
+_init_lock = threading.Lock()
+
+
+class GeminiClient:
+    """Process-wide Gemini model client with a concurrency limit and deadlines."""
+
+    @staticmethod
+    def _get_client():
+        """Configure the SDK and create the shared client and limiter on first use."""
+        global _client, _model_name, _semaphore
+        if _client is not None:
+            return _client
+
+        with _init_lock:
+            if _client is None:
+                api_key = current_app.config.get('GEMINI_API_KEY')
+                if not api_key:
+                    raise ValueError("GEMINI_API_KEY is not configured.")
+                genai.configure(api_key=api_key)
+                model = current_app.config.get('GEMINI_MODEL', 'gemini-pro')
+                _model_name = model if model.startswith('models/') else f"models/{model}"
+                _semaphore = threading.BoundedSemaphore(
+                    max(1, current_app.config.get('GEMINI_MAX_CONCURRENCY', 4))
+                )
+                _client = get_default_generative_client()
+                logger.info("Initialized shared Gemini client")
+        return _client
+
+    @staticmethod
+    def build_request(prompt, temperature=0.1):
+        return glm.GenerateContentRequest(
+            model=_model_name,
+            contents=[glm.Content(parts=[glm.Part(text=prompt)])],
+            generation_config=glm.GenerationConfig(temperature=temperature)
+        )
+
+    @staticmethod
+    def generate(prompt, deadline, temperature=0.1):
+        """
+        Run one model call that must finish by `deadline` (time.monotonic()).
+
+        Raises:
+            DeadlineExceeded: No call slot freed up or the model did not answer in time
+            ResourceExhausted: Gemini quota exceeded
+        """
+        client = GeminiClient._get_client()
+        request = GeminiClient.build_request(prompt, temperature)
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or not _semaphore.acquire(timeout=remaining):
+            raise DeadlineExceeded("No Gemini call slot available within the generation budget.")
+        try:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise DeadlineExceeded("Generation budget exhausted before calling Gemini.")
+            response = client.generate_content(
+                request,
+                retry=None,
+                timeout=remaining
+            )
+        finally:
+            _semaphore.release()
+
+        return genai.types.GenerateContentResponse.from_response(response)
+
+    @staticmethod
+    def stream(prompt, deadline, temperature=0.1):
+        """
+        Stream the text of one model call as it is generated.
+        The call slot is held until the stream is exhausted or closed, and
+        the whole stream must finish by `deadline`.
+
+        Raises:
+            DeadlineExceeded: No call slot freed up or the stream did not finish in time
+            ResourceExhausted: Gemini quota exceeded
+        """
+        client = GeminiClient._get_client()
+        request = GeminiClient.build_request(prompt, temperature)
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or not _semaphore.acquire(timeout=remaining):
+            raise DeadlineExceeded("No Gemini call slot available within the generation budget.")
+        try:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise DeadlineExceeded("Generation budget exhausted before calling Gemini.")
+            for chunk in client.stream_generate_content(request, retry=None, timeout=remaining):
+                for candidate in chunk.candidates[:1]:
+                    text = ''.join(part.text for part in candidate.content.parts)
+                    if text:
+                        yield text
+        finally:
+            _semaphore.release()
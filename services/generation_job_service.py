@@ -0,0 +1,261 @@
+"""
+Asynchronous paper generation jobs for Academic ERP Backend.
+
+Generation requests submitted as jobs return a job id immediately and run
+on a bounded background thread pool, so request workers are not held for
+the Gemini round trip, fallback and inserts. Job state lives in a local
+SQLite table (WAL mode) that survives restarts and is shared by every
+worker process on the host; clients poll it for status and the result.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+STATUS_QUEUED = 'queued'
+STATUS_RUNNING = 'running'
+STATUS_SUCCEEDED = 'succeeded'
+STATUS_FAILED = 'failed'
+TERMINAL_STATUSES = (STATUS_SUCCEEDED, STATUS_FAILED)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS generation_jobs (
+    id TEXT PRIMARY KEY,
+    course_id INTEGER,
+    faculty_id INTEGER,
+    status TEXT NOT NULL,
+    params TEXT NOT NULL,
+    paper_id INTEGER,
+    result TEXT,
+    error TEXT,
+    worker_pid INTEGER,
+    created_at TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_generation_jobs_status ON generation_jobs(status);
+CREATE INDEX IF NOT EXISTS idx_generation_jobs_faculty ON generation_jobs(faculty_id, created_at);
+"""
+
+_executor = None
+_executor_lock = threading.Lock()
+_inflight = 0
+_schema_ready = False
+# time.monotonic() of the last orphaned-job scan in this process
+_last_resume = float('-inf')
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+class GenerationJobService:
+    """Service class for background paper generation jobs."""
+
+    # ==================== Storage ====================
+
+    @staticmethod
+    @contextmanager
+    def _connect():
+        """Open an autocommit connection to the job table, creating it on first use."""
+        global _schema_ready
+        path = current_app.config.get('GENERATION_JOB_DB', 'generation_jobs.sqlite3')
+        if not _schema_ready and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = sqlite3.connect(path, timeout=10, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            if not _schema_ready:
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.executescript(_SCHEMA)
+                _schema_ready = True
+            yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _to_dict(row):
+        job = dict(row)
+        job['params'] = json.loads(job['params']) if job.get('params') else None
+        job['result'] = json.loads(job['result']) if job.get('result') else None
+        job.pop('worker_pid', None)
+        return job
+
+    @staticmethod
+    def _update(job_id, **fields):
+        columns = ', '.join(f"{name} = ?" for name in fields)
+        with GenerationJobService._connect() as conn:
+            conn.execute(f"UPDATE generation_jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    # ==================== Executor ====================
+
+    @staticmethod
+    def _get_executor(app):
+        """Create the per-process executor on first use."""
+        global _executor
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=app.config.get('GENERATION_JOB_WORKERS', 2),
+                    thread_name_prefix='paper-job'
+                )
+            return _executor
+
+    @staticmethod
+    def _pid_alive(pid):
+        """Whether a worker process of this host is still running."""
+        if not pid:
+            return False
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+    @staticmethod
+    def resume_orphaned_jobs(app, force=False):
+        """
+        Adopt jobs whose worker is gone: running jobs of a dead worker (or
+        running past GENERATION_JOB_STALE_SECONDS) are queued again, and
+        queued jobs of a dead worker are dispatched here. Each job is adopted
+        by one process only (compare-and-set on worker_pid), and _run still
+        claims it by UPDATE before executing. Runs on the first submit or
+        poll of each process, then at most every GENERATION_JOB_RESUME_SECONDS.
+        """
+        global _last_resume
+        with _executor_lock:
+            interval = app.config.get('GENERATION_JOB_RESUME_SECONDS', 30)
+            if not force and time.monotonic() - _last_resume < interval:
+                return 0
+            _last_resume = time.monotonic()
+
+        me = os.getpid()
+        stale_before = datetime.fromtimestamp(
+            time.time() - app.config.get('GENERATION_JOB_STALE_SECONDS', 900), tz=timezone.utc
+        ).isoformat()
+        adopted = []
+        with GenerationJobService._connect() as conn:
+            for row in conn.execute(
+                "SELECT id, worker_pid, started_at FROM generation_jobs WHERE status = ?", (STATUS_RUNNING,)
+            ).fetchall():
+                orphaned = row['worker_pid'] != me and not GenerationJobService._pid_alive(row['worker_pid'])
+                if orphaned or (row['started_at'] or '') < stale_before:
+                    conn.execute(
+                        "UPDATE generation_jobs SET status = ?, worker_pid = NULL "
+                        "WHERE id = ? AND status = ? AND worker_pid IS ?",
+                        (STATUS_QUEUED, row['id'], STATUS_RUNNING, row['worker_pid'])
+                    )
+
+            for row in conn.execute(
+                "SELECT id, worker_pid FROM generation_jobs WHERE status = ? ORDER BY created_at",
+                (STATUS_QUEUED,)
+            ).fetchall():
+                if row['worker_pid'] == me or GenerationJobService._pid_alive(row['worker_pid']):
+                    continue
+                if conn.execute(
+                    "UPDATE generation_jobs SET worker_pid = ? "
+                    "WHERE id = ? AND status = ? AND worker_pid IS ?",
+                    (me, row['id'], STATUS_QUEUED, row['worker_pid'])
+                ).rowcount:
+                    adopted.append(row['id'])
+
+        if adopted:
+            GenerationJobService._get_executor(app)
+            for job_id in adopted:
+                GenerationJobService._dispatch(app, job_id)
+            logger.info(f"Resumed {len(adopted)} orphaned paper generation jobs")
+        return len(adopted)
+
+    @staticmethod
+    def _dispatch(app, job_id):
+        global _inflight
+        with _executor_lock:
+            _inflight += 1
+        _executor.submit(GenerationJobService._run, app, job_id)
+
+    @staticmethod
+    def _run(app, job_id):
+        """Claim and execute one job inside an application context."""
+        global _inflight
+        from services.paper_generation_service import PaperGenerationService
+
+        try:
+            with app.app_context():
+                with GenerationJobService._connect() as conn:
+                    claimed = conn.execute(
+                        "UPDATE generation_jobs SET status = ?, started_at = ?, worker_pid = ? "
+                        "WHERE id = ? AND status = ?",
+                        (STATUS_RUNNING, _now(), os.getpid(), job_id, STATUS_QUEUED)
+                    ).rowcount
+                    if not claimed:
+                        return
+                    job = conn.execute("SELECT * FROM generation_jobs WHERE id = ?", (job_id,)).fetchone()
+
+                try:
+                    paper, error = PaperGenerationService.generate_paper(
+                        json.loads(job['params']), job['faculty_id']
+                    )
+                except Exception as e:
+                    logger.exception(f"Paper generation job {job_id} crashed")
+                    paper, error = None, str(e)
+
+                if error:
+                    GenerationJobService._update(
+                        job_id, status=STATUS_FAILED, error=error, finished_at=_now()
+                    )
+                else:
+                    GenerationJobService._update(
+                        job_id, status=STATUS_SUCCEEDED, paper_id=paper.get('id'),
+                        result=json.dumps(paper, default=str), finished_at=_now()
+                    )
+                logger.info(f"Paper generation job {job_id} finished: {'failed' if error else 'succeeded'}")
+        finally:
+            with _executor_lock:
+                _inflight -= 1
+
+    # ==================== Public API ====================
+
+    @staticmethod
+    def submit_job(data, faculty_id):
+        """
+        Queue a paper generation job.
+
+        Returns:
+            Tuple of (job dict, error message)
+        """
+        app = current_app._get_current_object()
+        GenerationJobService._get_executor(app)
+        GenerationJobService.resume_orphaned_jobs(app)
+
+        if _inflight >= app.config.get('GENERATION_JOB_MAX_PENDING', 20):
+            return None, "Paper generation queue is full, please retry shortly."
+
+        job_id = uuid.uuid4().hex
+        with GenerationJobService._connect() as conn:
+            conn.execute(
+                "INSERT INTO generation_jobs (id, course_id, faculty_id, status, params, worker_pid, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, data.get('course_id'), faculty_id, STATUS_QUEUED, json.dumps(data), os.getpid(), _now())
+            )
+        GenerationJobService._dispatch(app, job_id)
+        return GenerationJobService.get_job(job_id), None
+
+    @staticmethod
+    def get_job(job_id):
+        """Get a job with its status and, once finished, its result."""
+        GenerationJobService.resume_orphaned_jobs(current_app._get_current_object())
+        with GenerationJobService._connect() as conn:
+            row = conn.execute("SELECT * FROM generation_jobs WHERE id = ?", (job_id,)).fetchone()
+        return GenerationJobService._to_dict(row) if row else None
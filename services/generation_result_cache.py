@@ -0,0 +1,179 @@
+"""
+Content-addressed generation result cache for Academic ERP Backend.
+
+Two layers, both keyed by a hash of the normalized request parameters and
+the bank snapshot version (which follows question content, not usage):
+
+- Saved papers: a faculty re-submitting a request it just generated (a
+  double submit or client retry) within GENERATION_IDEMPOTENCY_SECONDS
+  gets the paper that request saved instead of a second paper. Identical
+  requests of one faculty are serialized per process, so a concurrent
+  duplicate waits for the first and receives its paper.
+- Selections: identical requests under the same rotation state (the key
+  includes RotationPlan.fingerprint) reuse the selection, persisted as a
+  new paper without re-running the selector or Gemini. Saving a paper
+  rotates its questions out under the 'exclude' and 'downweight'
+  policies, so the next request legitimately gets a fresh selection;
+  selections are reused as long as rotation state does not move (policy
+  'off', or no paper saved in between).
+
+Entries are held per worker process in LRUs bounded by
+GENERATION_RESULT_CACHE_SIZE; entries of a course are dropped as soon as
+a lookup sees a newer bank snapshot version for it.
+"""
+import copy
+import hashlib
+import json
+import logging
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+# Parameters that only label the stored paper and never change the selection
+IGNORED_PARAMS = ('title',)
+
+_entries = OrderedDict()
+_saved = OrderedDict()
+_request_locks = weakref.WeakValueDictionary()
+_course_versions = {}
+_lock = threading.Lock()
+
+
+def _normalize(value):
+    """Canonical form of a parameter value: sorted keys, numbers as floats, no empties."""
+    if isinstance(value, dict):
+        return {
+            str(k).strip(): _normalize(v)
+            for k, v in value.items()
+            if v not in (None, '', [], {})
+        }
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        return value.strip()
+    return value
+
+
+class GenerationResultCache:
+    """Service class for cached paper generation results."""
+
+    @staticmethod
+    def make_key(data, bank_version, rotation=None, faculty_id=None):
+        """
+        Hash the normalized generation parameters together with the bank
+        version and either the rotation fingerprint (RotationPlan.fingerprint,
+        selection keys: a hit never bypasses questions rotated out since the
+        cached run) or the faculty id (saved-paper keys).
+        """
+        params = {k: v for k, v in data.items() if k not in IGNORED_PARAMS}
+        normalized = _normalize(params)
+        if 'previously_used_ids' in normalized:
+            normalized['previously_used_ids'] = sorted({int(q) for q in normalized['previously_used_ids']})
+        payload = json.dumps(
+            {'params': normalized, 'bank_version': bank_version, 'rotation': rotation, 'faculty': faculty_id},
+            sort_keys=True, separators=(',', ':'), default=str
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _sync_course(course_id, bank_version):
+        """Drop a course's entries once its bank version moves on (caller holds the lock)."""
+        if _course_versions.get(course_id) == bank_version:
+            return
+        stale = 0
+        for entries in (_entries, _saved):
+            keys = [key for key, entry in entries.items() if entry['course_id'] == course_id]
+            for key in keys:
+                del entries[key]
+            stale += len(keys)
+        if stale:
+            logger.info(f"Dropped {stale} cached generation results for course {course_id}")
+        _course_versions[course_id] = bank_version
+
+    @staticmethod
+    def get(course_id, bank_version, key):
+        """
+        Look up a cached result.
+
+        Returns:
+            Tuple of (source, payload copy) or None on a miss
+        """
+        with _lock:
+            GenerationResultCache._sync_course(course_id, bank_version)
+            entry = _entries.get(key)
+            if entry is None:
+                return None
+            _entries.move_to_end(key)
+            return entry['source'], copy.deepcopy(entry['payload'])
+
+    @staticmethod
+    def put(course_id, bank_version, key, source, payload):
+        """Store a result, evicting the least recently used entries beyond the size limit."""
+        max_entries = current_app.config.get('GENERATION_RESULT_CACHE_SIZE', 256)
+        if max_entries <= 0:
+            return
+        with _lock:
+            GenerationResultCache._sync_course(course_id, bank_version)
+            _entries[key] = {
+                'course_id': course_id,
+                'source': source,
+                'payload': copy.deepcopy(payload)
+            }
+            _entries.move_to_end(key)
+            while len(_entries) > max_entries:
+                _entries.popitem(last=False)
+
+    @staticmethod
+    def request_lock(key):
+        """Per-process lock serializing requests with the same saved-paper key."""
+        with _lock:
+            lock = _request_locks.get(key)
+            if lock is None:
+                lock = threading.Lock()
+                _request_locks[key] = lock
+            return lock
+
+    @staticmethod
+    def get_saved(course_id, bank_version, key):
+        """Paper saved by the same request within GENERATION_IDEMPOTENCY_SECONDS, or None."""
+        window = current_app.config.get('GENERATION_IDEMPOTENCY_SECONDS', 30)
+        with _lock:
+            GenerationResultCache._sync_course(course_id, bank_version)
+            entry = _saved.get(key)
+            if entry is None or time.monotonic() - entry['saved_at'] > window:
+                return None
+            return copy.deepcopy(entry['payload'])
+
+    @staticmethod
+    def put_saved(course_id, bank_version, key, paper):
+        """Remember the paper a request saved."""
+        max_entries = current_app.config.get('GENERATION_RESULT_CACHE_SIZE', 256)
+        if max_entries <= 0 or current_app.config.get('GENERATION_IDEMPOTENCY_SECONDS', 30) <= 0:
+            return
+        with _lock:
+            GenerationResultCache._sync_course(course_id, bank_version)
+            _saved[key] = {
+                'course_id': course_id,
+                'saved_at': time.monotonic(),
+                'payload': copy.deepcopy(paper)
+            }
+            _saved.move_to_end(key)
+            while len(_saved) > max_entries:
+                _saved.popitem(last=False)
+
+    @staticmethod
+    def clear():
+        """Drop every cached result."""
+        with _lock:
+            _entries.clear()
+            _saved.clear()
+            _course_versions.clear()
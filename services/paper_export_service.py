@@ -0,0 +1,230 @@
+"""
+Paper export service for Academic ERP Backend.
+
+Renders generated papers as PDF or DOCX (utils/paper_renderer.py) on a
+per-process pool of worker processes, so the CPU-heavy layout work never
+runs on request threads. Rendered files are cached on local disk under
+the SHA-256 of the paper document they were rendered from (which follows
+the paper snapshot), so re-downloads are served straight from disk and
+concurrent requests for the same render share one job.
+"""
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from flask import current_app
+
+from services.paper_generation_service import PaperGenerationService
+from utils.paper_renderer import FORMATS, RENDERER_VERSION, render_to_file
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INSTRUCTIONS = [
+    'Answer the questions as directed in each section.',
+    'Figures in the Marks column indicate full marks.',
+    'CO: course outcome, BL: Bloom\'s taxonomy level.',
+]
+
+_executor = None
+_executor_lock = threading.Lock()
+# Cache file path -> Future of a render in progress
+_pending = {}
+# Cache file path -> error of a failed render not yet reported to a poll
+_failed = {}
+
+
+class PaperExportService:
+    """Service class for printable paper exports."""
+
+    @staticmethod
+    def _get_executor(app):
+        global _executor
+        with _executor_lock:
+            if _executor is None:
+                # Spawned workers do not inherit the threads and locks of the web process
+                _executor = ProcessPoolExecutor(
+                    max_workers=app.config.get('PAPER_RENDER_WORKERS', 2),
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            return _executor
+
+    @staticmethod
+    def option_pairs(options):
+        """Normalize a question's options JSON (list or {label: text}) into (label, text) pairs."""
+        if isinstance(options, dict):
+            return [(str(label), str(text)) for label, text in options.items()]
+        if isinstance(options, list):
+            pairs = []
+            for i, option in enumerate(options):
+                if isinstance(option, dict):
+                    option = option.get('text') or option.get('option') or ''
+                pairs.append((chr(ord('a') + i) if i < 26 else str(i + 1), str(option)))
+            return pairs
+        return []
+
+    @staticmethod
+    def build_document(paper):
+        """
+        Layout-ready document of a paper (from get_paper_details): header,
+        instructions and sections with their questions, marks, CO and BL.
+        """
+        params = paper.get('generation_params') or {}
+
+        sections = {}
+        for row in paper.get('questions') or []:
+            question = row.get('questions') or {}
+            co = (question.get('course_outcomes') or {}).get('co_number')
+            bloom = question.get('bloom_levels') or {}
+            sections.setdefault(row['section'], []).append({
+                'number': row['question_number'],
+                'text': question.get('question_text') or '',
+                'options': PaperExportService.option_pairs(question.get('options')),
+                'marks': row['marks'],
+                'co': f"CO{co}" if co else '',
+                'bl': f"L{bloom['level']}" if bloom.get('level') else (bloom.get('name') or ''),
+            })
+
+        document_sections = []
+        for name, questions in sections.items():
+            # Blueprints have no optional questions: every question is answered
+            document_sections.append({
+                'name': name,
+                'marks': sum(q['marks'] for q in questions),
+                'instructions': 'Answer all questions.',
+                'questions': sorted(questions, key=lambda q: q['number']),
+            })
+
+        instructions = params.get('instructions') or DEFAULT_INSTRUCTIONS
+        if isinstance(instructions, str):
+            instructions = [line.strip() for line in instructions.splitlines() if line.strip()]
+
+        course = ' - '.join(str(part) for part in (params.get('course_code'), params.get('course')) if part)
+        exam_type = paper.get('exam_type') or params.get('assessment_type') or ''
+        return {
+            'title': paper.get('title') or 'Question Paper',
+            'course': course,
+            'exam_type': str(exam_type).replace('_', ' ').title(),
+            'total_marks': paper.get('total_marks'),
+            'duration_minutes': paper.get('duration_minutes'),
+            'instructions': instructions,
+            # In the snapshot's (blueprint) order, as paper['questions'] lists them
+            'sections': document_sections,
+        }
+
+    @staticmethod
+    def cache_key(document):
+        payload = json.dumps({'renderer': RENDERER_VERSION, 'document': document}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _evict(cache_dir, max_bytes):
+        """Remove least recently used renders until the cache fits max_bytes."""
+        try:
+            files = [entry for entry in os.scandir(cache_dir) if entry.is_file() and not entry.name.endswith('.tmp')]
+        except FileNotFoundError:
+            return
+        files.sort(key=lambda entry: entry.stat().st_mtime)
+        total = sum(entry.stat().st_size for entry in files)
+        for entry in files:
+            if total <= max_bytes:
+                break
+            try:
+                total -= entry.stat().st_size
+                os.remove(entry.path)
+            except FileNotFoundError:
+                continue
+
+    @staticmethod
+    def export_paper(paper_id, fmt):
+        """
+        Rendered file of a paper.
+
+        Returns:
+            Tuple of (result, error message). result is None when the paper
+            does not exist, {'status': 'ready', 'path', 'etag', 'mimetype',
+            'filename'} when the file is on disk, or {'status': 'rendering'}
+            while the render runs. The request returns 'rendering' at once
+            unless PAPER_RENDER_WAIT_SECONDS (default 0) allows it to wait.
+        """
+        if fmt not in FORMATS:
+            return None, f"format must be one of: {', '.join(FORMATS)}"
+
+        paper = PaperGenerationService.get_paper_details(paper_id)
+        if not paper:
+            return None, None
+
+        app = current_app._get_current_object()
+        document = PaperExportService.build_document(paper)
+        key = PaperExportService.cache_key(document)
+        cache_dir = app.config.get('PAPER_RENDER_CACHE_DIR', 'render_cache')
+        path = os.path.abspath(os.path.join(cache_dir, f"{key}.{fmt}"))
+        ready = {
+            'status': 'ready',
+            'path': path,
+            'etag': f"{key}-{fmt}",
+            'mimetype': FORMATS[fmt],
+            'filename': f"paper-{paper_id}.{fmt}",
+        }
+
+        if os.path.exists(path):
+            os.utime(path)
+            return ready, None
+
+        with _executor_lock:
+            # A render that failed since the last poll is reported once, then retried
+            failure = _failed.pop(path, None)
+            future = _pending.get(path)
+        if failure:
+            logger.error(f"Rendering paper {paper_id} as {fmt} failed: {failure}")
+            return None, "Failed to render paper."
+        if future is None:
+            executor = PaperExportService._get_executor(app)
+            with _executor_lock:
+                future = _pending.get(path)
+                if future is None:
+                    try:
+                        future = executor.submit(render_to_file, fmt, document, path)
+                    except BrokenProcessPool as e:
+                        PaperExportService._reset_executor(executor)
+                        logger.error(f"Render pool unavailable for paper {paper_id}: {str(e)}")
+                        return None, "Failed to render paper."
+                    _pending[path] = future
+                    max_bytes = app.config.get('PAPER_RENDER_CACHE_MAX_MB', 200) * 1024 * 1024
+                    future.add_done_callback(
+                        lambda f: PaperExportService._finish(path, f, cache_dir, max_bytes)
+                    )
+
+        try:
+            future.result(timeout=app.config.get('PAPER_RENDER_WAIT_SECONDS', 0))
+        except FutureTimeout:
+            return {'status': 'rendering'}, None
+        except Exception as e:
+            with _executor_lock:
+                _failed.pop(path, None)
+            logger.error(f"Rendering paper {paper_id} as {fmt} failed: {str(e)}")
+            return None, "Failed to render paper."
+        return ready, None
+
+    @staticmethod
+    def _reset_executor(broken):
+        """Drop a broken pool so the next export starts a fresh one."""
+        global _executor
+        with _executor_lock:
+            if _executor is broken:
+                _executor = None
+        broken.shutdown(wait=False)
+
+    @staticmethod
+    def _finish(path, future, cache_dir, max_bytes):
+        error = None if future.cancelled() else future.exception()
+        with _executor_lock:
+            _pending.pop(path, None)
+            if error is not None:
+                _failed[path] = str(error) or type(error).__name__
+        if error is None:
+            PaperExportService._evict(cache_dir, max_bytes)
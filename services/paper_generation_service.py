@@ -3,16 +3,88 @@ Paper Generation service for Academic ERP Backend.
 Integrates with Google Gemini AI for intelligent question paper generation.
 """
 import json
-import random
 import logging
-import google.generativeai as genai
-from google.api_core.exceptions import ResourceExhausted
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from google.api_core.exceptions import DeadlineExceeded, ResourceExhausted
 from datetime import datetime
 from flask import current_app
+from services.paper_selector import PaperSelector
+from services.question_bank_cache import QuestionBankCache
+from services.generation_result_cache import GenerationResultCache
+from services.gemini_client import GeminiClient
+from services.question_rotation import QuestionRotation
+from services.paper_response_cache import PaperResponseCache
+from utils.incremental_json import SectionStreamParser, parse_model_json
 from utils.supabase_client import get_supabase_client
 
 logger = logging.getLogger(__name__)
 
+# generated_papers projection listed in history, covered by the history
+# indexes of migrations/009_paper_history_projection.sql
+PAPER_HISTORY_COLUMNS = (
+    "id, course_id, faculty_id, title, exam_type, total_marks, question_count, "
+    "status, source_engine, created_at"
+)
+
+# Background threads for the Gemini leg of hedged generation (created on first use)
+_hedge_executor = None
+_hedge_executor_lock = threading.Lock()
+
+# Bank entry fields exposed to the model in the 'full' prompt mode
+PROMPT_FIELDS = ('qid', 'question_text', 'marks', 'unit', 'co', 'bloom', 'difficulty')
+
+# 'full': JSON bank and full output schema (legacy)
+# 'compact': dictionary-encoded table with texts; the model returns qids only
+# 'attributes': like 'compact' but without question texts
+PROMPT_MODES = ('full', 'compact', 'attributes')
+
+FULL_OUTPUT_SCHEMA = """{
+  "paper": {
+    "course": "...",
+    "course_code": "...",
+    "assessment_type": "...",
+    "total_marks": 0,
+    "sections": [
+      {
+        "section": "Section A",
+        "instructions": "Answer all questions",
+        "questions": [
+          {
+            "qid": "id from bank",
+            "question_text": "text from bank",
+            "marks": 0,
+            "unit": 0,
+            "co": "...",
+            "bloom": "...",
+            "difficulty": "..."
+          }
+        ]
+      }
+    ]
+  }
+}"""
+
+COMPACT_OUTPUT_SCHEMA = """{
+  "paper": {
+    "sections": [
+      {"section": "Section A", "instructions": "Answer all questions", "qids": [0]}
+    ]
+  }
+}"""
+
+COMPACT_BANK_LEGEND = (
+    "Columns: q=qid, m=marks, u=unit number, c=CO code, b=Bloom code, d=difficulty code, "
+    "t=question text. Codes are defined in the CO/BLOOM/DIFFICULTY lines."
+)
+
+
+def estimate_tokens(text):
+    """Rough token estimate (~4 characters per token) for prompt size accounting."""
+    return -(-len(text) // 4)
+
 class PaperGenerationService:
     """Service class for question paper generation engine with Gemini AI."""
     
@@ -20,60 +92,196 @@ class PaperGenerationService:
     def generate_paper(data, faculty_id):
         """
         Main entry point for paper generation.
-        Tries Gemini first, falls back to deterministic if fails.
+        Runs the deterministic selector first and only calls Gemini when the
+        selection misses its targets (engine 'auto'), or always ('ai').
+        The selector result is the fallback if Gemini fails. Engine 'hedged'
+        races Gemini against the selector under PAPER_HEDGE_BUDGET_SECONDS.
+        Questions used by the course's latest papers are rotated out (see
+        QuestionRotation). A faculty re-submitting a request it just
+        generated gets the paper already saved (see GenerationResultCache).
         """
-        supabase = get_supabase_client()
         course_id = data.get('course_id')
+        deadline = time.monotonic() + current_app.config.get('PAPER_GENERATION_BUDGET_SECONDS', 25)
         
-        # Fetch Question Bank with relations
-        response = supabase.table('questions').select(
-            "*, units(unit_number), course_outcomes(co_number), bloom_levels(name), difficulty_levels(name)"
-        ).eq('course_id', course_id).eq('status', 'active').execute()
-        
-        question_bank = response.data
-        
-        if not question_bank:
+        # Question bank snapshot (cached per course, refreshed incrementally)
+        snapshot = QuestionBankCache.get_snapshot(course_id)
+        if not len(snapshot.bank):
             return None, "Question bank for this course is empty."
 
-        # Convert question bank to simple dict for AI performance
-        bank_json = [
-            {
-                "qid": q['id'],
-                "question_text": q['question_text'],
-                "marks": q['marks'],
-                "unit": q['units']['unit_number'] if q.get('units') else 0,
-                "co": f"CO{q['course_outcomes']['co_number']}" if q.get('course_outcomes') else "",
-                "bloom": q['bloom_levels']['name'] if q.get('bloom_levels') else "",
-                "difficulty": q['difficulty_levels']['name'] if q.get('difficulty_levels') else ""
-            }
-            for q in question_bank
-        ]
+        # 0. Re-submission of a request this faculty just generated: return its paper
+        request_key = GenerationResultCache.make_key(data, snapshot.version, faculty_id=faculty_id)
+        with GenerationResultCache.request_lock(request_key):
+            saved = GenerationResultCache.get_saved(course_id, snapshot.version, request_key)
+            if saved:
+                logger.info(f"Returning paper {saved.get('id')} saved by the same request: Course {course_id}")
+                return saved, None
 
-        # Filter out previously used questions if provided
-        prev_ids = data.get('previously_used_ids', [])
-        eligible_bank = [q for q in bank_json if q['qid'] not in prev_ids]
-        
-        if len(eligible_bank) < data.get('total_questions', 5): # Basic threshold
-            logger.warning("Eligible question bank is small, using full bank.")
-            eligible_bank = bank_json
+            paper, error = PaperGenerationService.generate_new_paper(data, faculty_id, snapshot, deadline)
+            if paper:
+                GenerationResultCache.put_saved(course_id, snapshot.version, request_key, paper)
+            return paper, error
+
+    @staticmethod
+    def generate_new_paper(data, faculty_id, snapshot, deadline):
+        """
+        Select (or generate) and save a new paper from a bank snapshot.
+        Requests that repeat an earlier one against the same bank snapshot
+        and rotation state reuse its selection from the result cache.
+        """
+        course_id = data.get('course_id')
+        engine = data.get('engine') or current_app.config.get('PAPER_GENERATION_ENGINE', 'auto')
+        bank = snapshot.bank
+
+        # Rotation: exclude (or down-weight) questions used by the latest papers of the course
+        rotation = QuestionRotation.plan(course_id, bank, data)
+
+        # Identical request against the same bank version and rotation state:
+        # persist the cached selection
+        cache_key = GenerationResultCache.make_key(data, snapshot.version, rotation.fingerprint(bank))
+        cached = GenerationResultCache.get(course_id, snapshot.version, cache_key)
+        if cached:
+            source, payload = cached
+            logger.info(f"Generation result cache hit ({source}): Course {course_id}")
+            if source == 'ai':
+                return PaperGenerationService.save_generated_paper(payload, data, faculty_id)
+            return PaperGenerationService.fallback_algorithm(data, faculty_id, bank, payload)
+
+        # Hedged: Gemini runs in the background while the selector runs here
+        ai_future = None
+        if engine == 'hedged':
+            hedge_budget = current_app.config.get('PAPER_HEDGE_BUDGET_SECONDS', 8)
+            ai_future = PaperGenerationService.start_hedged_ai(
+                data, rotation.eligible(bank)[0], min(deadline, time.monotonic() + hedge_budget)
+            )
+
+        # 1. Deterministic optimizing selection
+        eligible_bank, selection = PaperGenerationService.select_with_rotation(bank, data, rotation)
+        if ai_future is not None:
+            return PaperGenerationService.finish_hedged(
+                ai_future, data, faculty_id, eligible_bank, selection,
+                lambda ai_paper: GenerationResultCache.put(course_id, snapshot.version, cache_key, 'ai', ai_paper)
+            )
+        if engine == 'deterministic' or (engine == 'auto' and selection['report']['within_tolerance']):
+            logger.info(f"Deterministic selection met blueprint targets: Course {course_id}")
+            GenerationResultCache.put(course_id, snapshot.version, cache_key, 'deterministic', selection)
+            return PaperGenerationService.fallback_algorithm(data, faculty_id, eligible_bank, selection)
 
         try:
-            # 1. AI Generation
+            # 2. AI Generation
             logger.info(f"Calling Gemini for paper generation: Course {course_id}")
-            ai_paper = PaperGenerationService.call_gemini_api(data, eligible_bank)
+            ai_paper = PaperGenerationService.call_gemini_api(data, eligible_bank, deadline)
             
             if ai_paper:
-                # 2. Validate and Save
+                # 3. Validate and Save
+                GenerationResultCache.put(course_id, snapshot.version, cache_key, 'ai', ai_paper)
                 return PaperGenerationService.save_generated_paper(ai_paper, data, faculty_id)
             
         except ResourceExhausted:
             logger.warning("Gemini AI Rate Quota Exceeded. Switching to deterministic fallback engine.")
+        except DeadlineExceeded as e:
+            logger.warning(f"Gemini missed the generation deadline ({e}). Switching to deterministic fallback engine.")
         except Exception as e:
             logger.error(f"Gemini generation failed: {str(e)}")
             
-        # 3. Fallback to deterministic
+        # 4. Fallback to deterministic (not cached, so a later request retries Gemini)
         logger.info("Falling back to deterministic generation.")
-        return PaperGenerationService.fallback_algorithm(data, faculty_id, question_bank)
+        return PaperGenerationService.fallback_algorithm(data, faculty_id, eligible_bank, selection)
+
+    @staticmethod
+    def check_feasibility(data):
+        """
+        Dry-run a blueprint against the cached facet counts of the course bank.
+        Nothing is selected, persisted or sent to the AI.
+
+        Returns:
+            Tuple of (feasibility report, error message)
+        """
+        snapshot = QuestionBankCache.get_snapshot(data.get('course_id'))
+        bank = snapshot.bank
+        if not len(bank):
+            return None, "Question bank for this course is empty."
+
+        counts = snapshot.facet_counts
+        if data.get('previously_used_ids'):
+            counts = bank.take(bank.exclusion_mask(data['previously_used_ids'])).facet_counts()
+
+        report = PaperSelector.feasibility(
+            bank, counts, data,
+            tolerance=current_app.config.get('PAPER_COVERAGE_TOLERANCE', 10.0)
+        )
+        report['bank_size'] = len(bank)
+        return report, None
+
+    @staticmethod
+    def select_with_rotation(bank, data, rotation):
+        """
+        Run the selector on the rotation-eligible pool. If exclusions leave a
+        section short, retry on the full bank with recently used questions
+        only down-weighted.
+
+        Returns:
+            Tuple of (bank the selection was made from, selection)
+        """
+        tolerance = current_app.config.get('PAPER_COVERAGE_TOLERANCE', 10.0)
+        eligible_bank, recency = rotation.eligible(bank)
+        selection = PaperSelector.select(eligible_bank, data, tolerance=tolerance, recency=recency)
+        if not selection['report']['feasible'] and rotation.excluded.any():
+            eligible_bank, recency = rotation.relaxed(bank)
+            selection = PaperSelector.select(eligible_bank, data, tolerance=tolerance, recency=recency)
+        selection['report']['rotation'] = rotation.info
+        return eligible_bank, selection
+
+    @staticmethod
+    def start_hedged_ai(data, bank, deadline):
+        """
+        Start the Gemini leg of a hedged generation on a background thread.
+
+        Returns:
+            Tuple of (future, deadline) for finish_hedged
+        """
+        global _hedge_executor
+        with _hedge_executor_lock:
+            if _hedge_executor is None:
+                _hedge_executor = ThreadPoolExecutor(
+                    max_workers=current_app.config.get('GEMINI_MAX_CONCURRENCY', 4),
+                    thread_name_prefix='gemini-hedge'
+                )
+        app = current_app._get_current_object()
+
+        def run():
+            with app.app_context():
+                return PaperGenerationService.call_gemini_api(data, bank, deadline)
+
+        return _hedge_executor.submit(run), deadline
+
+    @staticmethod
+    def finish_hedged(ai_future, data, faculty_id, bank, selection, on_ai_result=None):
+        """
+        Return the AI paper if it arrived by the hedge deadline and validates,
+        otherwise the local selection. The losing result is discarded; a late
+        Gemini call is cut off by its own deadline.
+        """
+        future, deadline = ai_future
+        ai_paper, outcome = None, 'timeout'
+        try:
+            ai_paper = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            questions = sum(len(s.get('questions', [])) for s in (ai_paper or {}).get('paper', {}).get('sections', []))
+            outcome = 'accepted' if questions else 'invalid'
+        except FutureTimeout:
+            future.cancel()
+        except (DeadlineExceeded, ResourceExhausted) as e:
+            logger.warning(f"Hedged Gemini call unavailable: {e}")
+        except Exception as e:
+            outcome = 'error'
+            logger.error(f"Hedged Gemini call failed: {str(e)}")
+
+        params = {**data, 'hedge': {'ai_outcome': outcome}}
+        logger.info(f"Hedged generation resolved with AI outcome '{outcome}'")
+        if outcome == 'accepted':
+            if on_ai_result:
+                on_ai_result(ai_paper)
+            return PaperGenerationService.save_generated_paper(ai_paper, params, faculty_id)
+        return PaperGenerationService.fallback_algorithm(params, faculty_id, bank, selection)
 
     @staticmethod
     def build_system_prompt():
@@ -82,7 +290,7 @@ class PaperGenerationService:
             "You are an expert Academic Examination Controller. Your task is to generate a professional "
             "university question paper. \n\n"
             "STRICT RULES:\n"
-            "1. ONLY use questions from the provided 'Question Bank' JSON.\n"
+            "1. ONLY use questions from the provided 'Question Bank'.\n"
             "2. DO NOT invent new questions.\n"
             "3. Enforce the requested CO coverage, Bloom's distribution, and Difficulty mix.\n"
             "4. Ensure Unit coverage is balanced as per requirements.\n"
@@ -91,8 +299,26 @@ class PaperGenerationService:
         )
 
     @staticmethod
-    def build_runtime_prompt(data, bank):
-        """Construct the prompt with specific requirements and context."""
+    def build_runtime_prompt(data, bank, mode='full'):
+        """
+        Construct the prompt with specific requirements and context.
+
+        Args:
+            data: Generation parameters
+            bank: QuestionBank offered to the model
+            mode: One of PROMPT_MODES
+        """
+        if mode == 'full':
+            bank_block = json.dumps([{k: q[k] for k in PROMPT_FIELDS} for q in bank.entries()])
+            schema = FULL_OUTPUT_SCHEMA
+        else:
+            bank_block = f"{COMPACT_BANK_LEGEND}\n{bank.to_prompt_table(include_text=(mode == 'compact'))}"
+            schema = COMPACT_OUTPUT_SCHEMA
+
+        sections_line = ''
+        if data.get('sections'):
+            sections_line = f"- Sections: {json.dumps(data['sections'])}\n"
+
         return f"""
 Generate a question paper for:
 - Program: {data.get('program', 'B.Tech')}
@@ -105,83 +331,149 @@ Generate a question paper for:
 - Total Marks: {data.get('total_marks', 100)}
 
 REQUIREMENTS:
-- CO Coverage: {json.dumps(data.get('co_coverage', {}))}
+{sections_line}- CO Coverage: {json.dumps(data.get('co_coverage', {}))}
 - Bloom Distribution: {json.dumps(data.get('bloom_distribution', {}))}
 - Difficulty Mix: {json.dumps(data.get('difficulty_distribution', {}))}
 - Unit Coverage: {json.dumps(data.get('unit_coverage', {}))}
 
 QUESTION BANK:
-{json.dumps(bank)}
+{bank_block}
 
 OUTPUT SCHEMA:
-{{
-  "paper": {{
-    "course": "...",
-    "course_code": "...",
-    "assessment_type": "...",
-    "total_marks": 0,
-    "sections": [
-      {{
-        "section": "Section A",
-        "instructions": "Answer all questions",
-        "questions": [
-          {{
-            "qid": "id from bank",
-            "question_text": "text from bank",
-            "marks": 0,
-            "unit": 0,
-            "co": "...",
-            "bloom": "...",
-            "difficulty": "..."
-          }}
-        ]
-      }}
-    ]
-  }}
-}}
+{schema}
 """
 
     @staticmethod
-    def call_gemini_api(data, bank):
-        """Interface with Gemini Pro."""
-        api_key = current_app.config.get('GEMINI_API_KEY')
-        if not api_key:
-            raise ValueError("GEMINI_API_KEY is not configured.")
+    def prefilter_bank(data, bank):
+        """Restrict the bank offered to the model to questions that fit a requested section."""
+        if not data.get('sections'):
+            return bank
+        section_marks = {int(sp['marks_per_question']) for sp in data['sections']}
+        return bank.take(bank.marks_mask(section_marks))
+
+    @staticmethod
+    def call_gemini_api(data, bank, deadline=None):
+        """
+        Interface with Gemini through the shared process client.
+        The call must complete by `deadline` (time.monotonic()); defaults to
+        the configured generation budget from now.
+        """
+        if deadline is None:
+            deadline = time.monotonic() + current_app.config.get('PAPER_GENERATION_BUDGET_SECONDS', 25)
         
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel('gemini-pro')
+        mode = data.get('prompt_mode') or current_app.config.get('PAPER_PROMPT_MODE', 'compact')
+        prompt_bank = PaperGenerationService.prefilter_bank(data, bank)
         
         system_prompt = PaperGenerationService.build_system_prompt()
-        runtime_prompt = PaperGenerationService.build_runtime_prompt(data, bank)
+        runtime_prompt = PaperGenerationService.build_runtime_prompt(data, prompt_bank, mode)
         
-        response = model.generate_content(
-            f"{system_prompt}\n\n{runtime_prompt}",
-            generation_config={"temperature": 0.1}
+        logger.info(
+            f"Gemini prompt ({mode}): ~{estimate_tokens(runtime_prompt)} tokens, "
+            f"{len(prompt_bank)}/{len(bank)} questions"
         )
+        if mode != 'full' and logger.isEnabledFor(logging.DEBUG):
+            # Comparison only: serializes the whole bank as JSON
+            baseline = PaperGenerationService.build_runtime_prompt(data, bank, 'full')
+            logger.debug(f"Full JSON encoding of the same request: ~{estimate_tokens(baseline)} tokens")
         
-        return PaperGenerationService.validate_and_format_response(response.text, bank)
+        response = GeminiClient.generate(f"{system_prompt}\n\n{runtime_prompt}", deadline, temperature=0.1)
+        
+        ai_paper = PaperGenerationService.validate_and_format_response(response.text, prompt_bank, data)
+        return PaperGenerationService.repair_ai_paper(ai_paper, bank, data)
 
     @staticmethod
-    def validate_and_format_response(response_text, bank):
-        """Parse, validate, and sanitize AI response."""
+    def repair_ai_paper(ai_paper, bank, data):
+        """
+        Fill per-section shortfalls of a validated AI paper with the local
+        selector under the same coverage targets, keeping every usable AI
+        question. Applies when the request defines sections; a summary is
+        stored in ai_paper['repair'] and saved with the generation params.
+        """
+        specs = data.get('sections')
+        if not specs or not ai_paper:
+            return ai_paper
+        paper = ai_paper.setdefault('paper', {})
+        ai_sections = paper.get('sections', [])
+
+        def has_room(index, marks):
+            spec = specs[index]
+            return marks == int(spec['marks_per_question']) and len(locked[index]) < int(spec['total_questions'])
+
+        # AI questions stay in the requested section at the same position,
+        # otherwise move to the first section of the same marks with room
+        locked = [[] for _ in specs]
+        misplaced = []
+        for index, section in enumerate(ai_sections):
+            for q in section.get('questions', []):
+                if index < len(specs) and has_room(index, q['marks']):
+                    locked[index].append(q['qid'])
+                else:
+                    misplaced.append(q)
+        dropped = 0
+        for q in misplaced:
+            target = next((i for i in range(len(specs)) if has_room(i, q['marks'])), None)
+            if target is None:
+                dropped += 1
+            else:
+                locked[target].append(q['qid'])
+
+        shortfall = sum(int(spec['total_questions']) - len(ids) for spec, ids in zip(specs, locked))
+        if not shortfall and not misplaced:
+            return ai_paper
+
+        selection = PaperSelector.select(
+            bank, data,
+            tolerance=current_app.config.get('PAPER_COVERAGE_TOLERANCE', 10.0),
+            locked=locked
+        )
+        repaired, summary = [], []
+        for index, (spec, ids, section) in enumerate(zip(specs, locked, selection['sections'])):
+            ai_section = ai_sections[index] if index < len(ai_sections) else {}
+            repaired.append({
+                'section': ai_section.get('section') or spec['name'],
+                'instructions': ai_section.get('instructions'),
+                'questions': section['questions']
+            })
+            summary.append({
+                'name': spec['name'],
+                'ai_questions': len(ids),
+                'filled': len(section['questions']) - len(ids)
+            })
+        paper['sections'] = repaired
+        ai_paper['repair'] = {
+            'filled': sum(s['filled'] for s in summary),
+            'dropped': dropped,
+            'sections': summary,
+            'report': selection['report']
+        }
+        logger.info(
+            f"Repaired AI paper: filled {ai_paper['repair']['filled']} questions locally, dropped {dropped}"
+        )
+        return ai_paper
+
+    @staticmethod
+    def validate_and_format_response(response_text, bank, params=None):
+        """
+        Parse, validate, and sanitize AI response.
+        Accepts both output schemas; questions are hydrated from the bank by
+        qid so texts and attributes never come from the model. Unknown or
+        repeated qids are dropped here and the gaps filled by repair_ai_paper.
+        """
         try:
-            # Remove potential markdown clutter
-            clean_json = response_text.strip()
-            if clean_json.startswith("```json"):
-                clean_json = clean_json[7:-3].strip()
-            elif clean_json.startswith("```"):
-                clean_json = clean_json[3:-3].strip()
+            # Tolerates fences, stray prose, trailing commas and truncated output
+            data = parse_model_json(response_text)
             
-            data = json.loads(clean_json)
+            paper = data.setdefault('paper', {})
+            params = params or {}
+            paper.setdefault('course', params.get('course', 'AI Generated Paper'))
+            paper.setdefault('course_code', params.get('course_code'))
+            paper.setdefault('assessment_type', params.get('assessment_type', 'semester'))
+            paper.setdefault('total_marks', params.get('total_marks', 100))
             
-            # Validation: Ensure qids are from the bank
-            bank_ids = {str(q['qid']) for q in bank}
-            for section in data.get('paper', {}).get('sections', []):
-                valid_questions = []
-                for q in section.get('questions', []):
-                    if str(q.get('qid')) in bank_ids:
-                        valid_questions.append(q)
-                section['questions'] = valid_questions
+            # Validation: Ensure qids are from the bank, each used once
+            seen = set()
+            for section in paper.get('sections', []):
+                PaperGenerationService.validate_section(section, bank, seen)
                 
             return data
         except Exception as e:
@@ -189,38 +481,113 @@ OUTPUT SCHEMA:
             return None
 
     @staticmethod
-    def fallback_algorithm(data, faculty_id, full_bank):
-        """Deterministic random selection logic."""
-        supabase = get_supabase_client()
+    def validate_section(section, bank, seen):
+        """
+        Replace a model section's qids/questions with bank entries, in place.
+        Unknown qids and qids already in `seen` (used by an earlier section)
+        are dropped; accepted qids are added to `seen`.
+        """
+        qids = section.pop('qids', None)
+        if qids is None:
+            qids = [q.get('qid') for q in section.get('questions', []) if isinstance(q, dict)]
+        candidates = []
+        for qid in qids:
+            if str(qid).strip().isdigit() and int(qid) not in seen and int(qid) not in candidates:
+                candidates.append(int(qid))
+        section['questions'] = bank.entries(bank.positions_of(candidates))
+        seen.update(q['qid'] for q in section['questions'])
+        return section
+
+    @staticmethod
+    def stream_paper(data, faculty_id):
+        """
+        Streaming generation: yields (event, payload) tuples.
+
+        Gemini output is parsed incrementally and every completed section is
+        validated against the bank and yielded as a 'section' event. Gaps are
+        filled locally ('repair') and the saved paper is yielded as 'paper'; if Gemini fails or returns no usable
+        questions the deterministic selection is saved instead ('fallback'
+        followed by 'paper'). Errors are yielded as 'error'.
+        """
+        course_id = data.get('course_id')
+        deadline = time.monotonic() + current_app.config.get('PAPER_GENERATION_BUDGET_SECONDS', 25)
+
+        bank = QuestionBankCache.get_snapshot(course_id).bank
+        if not len(bank):
+            yield 'error', {'message': "Question bank for this course is empty."}
+            return
+
+        rotation = QuestionRotation.plan(course_id, bank, data)
+        eligible_bank = rotation.eligible(bank)[0]
+
+        mode = data.get('prompt_mode') or current_app.config.get('PAPER_PROMPT_MODE', 'compact')
+        prompt_bank = PaperGenerationService.prefilter_bank(data, eligible_bank)
+        prompt = (
+            f"{PaperGenerationService.build_system_prompt()}\n\n"
+            f"{PaperGenerationService.build_runtime_prompt(data, prompt_bank, mode)}"
+        )
+
+        parser = SectionStreamParser('sections')
+        sections, seen = [], set()
+        started = time.monotonic()
+        try:
+            for chunk in GeminiClient.stream(prompt, deadline):
+                for section in parser.feed(chunk):
+                    if not isinstance(section, dict):
+                        continue
+                    PaperGenerationService.validate_section(section, prompt_bank, seen)
+                    if section['questions']:
+                        if not sections:
+                            logger.info(f"First streamed section after {time.monotonic() - started:.2f}s")
+                        sections.append(section)
+                        yield 'section', section
+        except ResourceExhausted:
+            logger.warning("Gemini AI Rate Quota Exceeded during streaming.")
+        except DeadlineExceeded as e:
+            logger.warning(f"Gemini stream missed the generation deadline ({e}).")
+        except Exception as e:
+            logger.error(f"Gemini streaming failed: {str(e)}")
+
+        if sections:
+            ai_paper = {'paper': {
+                'course': data.get('course', 'AI Generated Paper'),
+                'course_code': data.get('course_code'),
+                'assessment_type': data.get('assessment_type', 'semester'),
+                'total_marks': data.get('total_marks', 100),
+                'sections': sections
+            }}
+            ai_paper = PaperGenerationService.repair_ai_paper(ai_paper, eligible_bank, data)
+            if ai_paper.get('repair'):
+                yield 'repair', ai_paper['repair']
+            paper, error = PaperGenerationService.save_generated_paper(
+                ai_paper, {**data, 'streamed': True}, faculty_id
+            )
+        else:
+            yield 'fallback', {'message': "Falling back to deterministic generation."}
+            selection_bank, selection = PaperGenerationService.select_with_rotation(bank, data, rotation)
+            paper, error = PaperGenerationService.fallback_algorithm(data, faculty_id, selection_bank, selection)
+
+        if error:
+            yield 'error', {'message': error}
+        else:
+            yield 'paper', paper
+
+    @staticmethod
+    def fallback_algorithm(data, faculty_id, bank, selection=None):
+        """
+        Deterministic selection path.
+        Uses the optimizing selector on a QuestionBank and stores its
+        deviation report with the paper.
+        """
         course_id = data.get('course_id')
         total_marks = data.get('total_marks', 100)
         
-        sections_params = data.get('sections', [
-            {"name": "Part A", "marks_per_question": 10, "total_questions": 10}
-        ])
-        
-        selected_questions = []
-        used_ids = set()
+        if selection is None:
+            selection = PaperSelector.select(
+                bank, data,
+                tolerance=current_app.config.get('PAPER_COVERAGE_TOLERANCE', 10.0)
+            )
         
-        # full_bank is a list of dicts (Supabase response) here
-        for sp in sections_params:
-            pool = [q for q in full_bank if q['marks'] == sp['marks_per_question'] and q['id'] not in used_ids]
-            num = sp['total_questions']
-            
-            if len(pool) < num:
-                num = len(pool)
-                
-            picked = random.sample(pool, num)
-            for i, q in enumerate(picked):
-                selected_questions.append({
-                    "section": sp['name'],
-                    "question_number": i + 1,
-                    "question_id": q['id'],
-                    "marks": q['marks'],
-                    "is_compulsory": True
-                })
-                used_ids.add(q['id'])
-
         # Create Paper
         paper_payload = {
             'course_id': course_id,
@@ -228,36 +595,199 @@ OUTPUT SCHEMA:
             'title': data.get('title', f"Generated-Paper-{datetime.now().strftime('%Y%m%d%H%M')}"),
             'exam_type': data.get('assessment_type', 'semester'),
             'total_marks': total_marks,
-            'generation_params': data,
-            'status': 'finalized'
+            'generation_params': {**data, 'source': 'deterministic', 'report': selection['report']},
+            'source_engine': 'deterministic',
+            'status': 'finalized',
+            **PaperGenerationService.paper_analytics(
+                q for section in selection['sections'] for q in section['questions']
+            )
         }
-        paper_res = supabase.table('generated_papers').insert(paper_payload).execute()
-        
-        if not paper_res.data:
+        saved = PaperGenerationService.persist_papers([
+            (paper_payload, PaperGenerationService.selection_question_rows(selection))
+        ])
+        if not saved:
             return None, "Failed to save paper."
             
-        paper = paper_res.data[0]
-        
-        # Save Questions
-        gq_payloads = []
-        for sq in selected_questions:
-            gq_payloads.append({
-                'paper_id': paper['id'],
-                'question_id': sq['question_id'],
-                'section': sq['section'],
-                'question_number': sq['question_number'],
-                'marks': sq['marks']
-            })
-            
-        if gq_payloads:
-            supabase.table('generated_questions').insert(gq_payloads).execute()
-            
+        paper = saved[0]
+        paper['report'] = selection['report']
         return paper, None
 
+    @staticmethod
+    def paper_analytics(entries):
+        """
+        Precomputed analytics columns of generated_papers, in one pass over
+        the selected bank entries: question_count and the percentage of marks
+        per unit number, Bloom level and difficulty ('Unassigned' if missing).
+        Matches migrations/006_paper_analytics_backfill.sql.
+        """
+        count, total = 0, 0
+        marks_by = {'unit_coverage': {}, 'bloom_distribution': {}, 'difficulty_distribution': {}}
+        for q in entries:
+            marks = q.get('marks') or 0
+            count += 1
+            total += marks
+            keys = (
+                ('unit_coverage', str(q['unit']) if q.get('unit') else 'Unassigned'),
+                ('bloom_distribution', q.get('bloom') or 'Unassigned'),
+                ('difficulty_distribution', q.get('difficulty') or 'Unassigned'),
+            )
+            for column, key in keys:
+                marks_by[column][key] = marks_by[column].get(key, 0) + marks
+
+        analytics = {'question_count': count}
+        for column, values in marks_by.items():
+            analytics[column] = {
+                key: round(100.0 * marks / total, 2) if total else 0.0
+                for key, marks in values.items()
+            }
+        return analytics
+
+    @staticmethod
+    def selection_question_rows(selection):
+        """generated_questions rows (without paper_id) for a selector result, numbered per section."""
+        return [
+            {
+                'question_id': q['qid'],
+                'section': section['name'],
+                'question_number': i + 1,
+                'marks': q['marks']
+            }
+            for section in selection['sections']
+            for i, q in enumerate(section['questions'])
+        ]
+
+    @staticmethod
+    def generate_paper_sets(data, faculty_id):
+        """
+        Multi-set generation (Set A, B, C, ...) from a single bank snapshot.
+
+        Sets are selected one after another with the questions of earlier sets
+        excluded, so they are pairwise disjoint. When a set cannot be filled
+        disjointly, up to `max_overlap` questions shared with each earlier set
+        are allowed. A set that still cannot be filled fails the request and
+        nothing is saved. Sets after the first target the difficulty mix that
+        Set A achieved unless a difficulty_distribution is requested. All
+        papers and their questions are written in one batch each.
+
+        Returns:
+            Tuple of (list of papers with reports, error message)
+        """
+        course_id = data.get('course_id')
+        set_count = int(data.get('set_count', 2))
+        max_overlap = int(data.get('max_overlap', current_app.config.get('PAPER_SET_MAX_OVERLAP', 0)))
+        tolerance = current_app.config.get('PAPER_COVERAGE_TOLERANCE', 10.0)
+
+        max_sets = current_app.config.get('PAPER_MAX_SETS', 6)
+        if not 1 <= set_count <= max_sets:
+            return None, f"set_count must be between 1 and {max_sets}."
+
+        bank = QuestionBankCache.get_snapshot(course_id).bank
+        if not len(bank):
+            return None, "Question bank for this course is empty."
+
+        rotation = QuestionRotation.plan(course_id, bank, data)
+        base_excluded = set(bank.ids[rotation.excluded].tolist())
+        labels = [chr(ord('A') + i) if i < 26 else str(i + 1) for i in range(set_count)]
+        set_data = dict(data)
+        selections, used_sets = [], []
+        for index in range(set_count):
+            used = set().union(*used_sets) if used_sets else set()
+            selection = PaperSelector.select(bank, set_data, base_excluded | used, tolerance, rotation.recency)
+
+            # Keep the sets disjoint before honouring rotation exclusions
+            if not selection['report']['feasible'] and base_excluded:
+                rotation.relaxed(bank)
+                base_excluded = set()
+                selection = PaperSelector.select(bank, set_data, used, tolerance, rotation.recency)
+
+            if not selection['report']['feasible'] and used_sets and max_overlap > 0:
+                allowance = PaperGenerationService.overlap_allowance(used_sets, max_overlap)
+                selection = PaperSelector.select(
+                    bank, set_data, base_excluded | (used - allowance), tolerance, rotation.recency
+                )
+
+            # Never persist a short set: the group is only useful when every set is complete
+            if not selection['report']['feasible']:
+                short = ', '.join(
+                    f"{s['name']} ({s['shortfall']} short)"
+                    for s in selection['report']['sections'] if s['shortfall']
+                )
+                hint = " Increase max_overlap or request fewer sets." if used_sets else ""
+                return None, f"Set {labels[index]} cannot be filled from the question bank: {short}.{hint}"
+
+            if index == 0 and not data.get('difficulty_distribution'):
+                set_data['difficulty_distribution'] = PaperGenerationService.difficulty_mix(bank, selection)
+
+            selection['report']['rotation'] = rotation.info
+            selections.append(selection)
+            used_sets.append({q['qid'] for s in selection['sections'] for q in s['questions']})
+
+        if not any(used_sets):
+            return None, "No questions in the bank match the requested sections."
+
+        group_id = uuid.uuid4().hex
+        base_title = data.get('title', f"Generated-Paper-{datetime.now().strftime('%Y%m%d%H%M')}")
+        paper_payloads = [
+            {
+                'course_id': course_id,
+                'faculty_id': faculty_id,
+                'title': f"{base_title} - Set {label}",
+                'exam_type': data.get('assessment_type', 'semester'),
+                'total_marks': data.get('total_marks', 100),
+                'generation_params': {
+                    **data, 'source': 'deterministic', 'report': selection['report'],
+                    'set': label, 'set_group': group_id
+                },
+                'source_engine': 'deterministic',
+                'status': 'finalized',
+                **PaperGenerationService.paper_analytics(
+                    q for section in selection['sections'] for q in section['questions']
+                )
+            }
+            for label, selection in zip(labels, selections)
+        ]
+        papers = PaperGenerationService.persist_papers([
+            (payload, PaperGenerationService.selection_question_rows(selection))
+            for payload, selection in zip(paper_payloads, selections)
+        ])
+        if not papers or len(papers) != len(paper_payloads):
+            return None, "Failed to save paper sets."
+
+        for paper, selection in zip(papers, selections):
+            paper['report'] = selection['report']
+
+        logger.info(f"Generated {len(papers)} paper sets (group {group_id}) for course {course_id}")
+        return papers, None
+
+    @staticmethod
+    def overlap_allowance(used_sets, max_overlap):
+        """Question ids a new set may reuse while sharing at most max_overlap with every earlier set."""
+        allowance = set()
+        shared = [0] * len(used_sets)
+        for index, qids in enumerate(used_sets):
+            for qid in sorted(qids):
+                if shared[index] >= max_overlap:
+                    break
+                owners = [j for j, other in enumerate(used_sets) if qid in other]
+                if qid not in allowance and all(shared[j] < max_overlap for j in owners):
+                    allowance.add(qid)
+                    for j in owners:
+                        shared[j] += 1
+        return allowance
+
+    @staticmethod
+    def difficulty_mix(bank, selection):
+        """Marks share per difficulty level of a selection, as a difficulty_distribution."""
+        qids = [q['qid'] for s in selection['sections'] for q in s['questions']]
+        selected = bank.take(bank.positions_of(qids))
+        mix = {}
+        for level, marks in zip(selected.facets['difficulty'].tolist(), selected.marks.tolist()):
+            mix[str(level)] = mix.get(str(level), 0) + marks
+        return mix
+
     @staticmethod
     def save_generated_paper(ai_data, original_params, faculty_id):
         """Persist AI generated structure to DB."""
-        supabase = get_supabase_client()
         course_id = original_params.get('course_id')
         paper_data = ai_data.get('paper', {})
         
@@ -268,51 +798,74 @@ OUTPUT SCHEMA:
             'title': paper_data.get('course', 'AI Generated Paper'),
             'exam_type': paper_data.get('assessment_type', 'semester'),
             'total_marks': paper_data.get('total_marks', 100),
-            'generation_params': original_params,
-            'status': 'finalized'
+            'generation_params': {
+                **original_params, 'source': 'ai',
+                **({'repair': ai_data['repair']} if ai_data.get('repair') else {})
+            },
+            'source_engine': 'ai',
+            'status': 'finalized',
+            **PaperGenerationService.paper_analytics(
+                q for section in paper_data.get('sections', []) for q in section.get('questions', [])
+            )
         }
-        paper_res = supabase.table('generated_papers').insert(paper_payload).execute()
         
-        if not paper_res.data:
-            return None, "Failed to save paper."
-            
-        paper = paper_res.data[0]
-        
-        # Save Questions
+        # Question rows
         gq_payloads = []
         
         for section in paper_data.get('sections', []):
             section_name = section.get('section', 'General')
             for i, q in enumerate(section.get('questions', [])):
                 gq_payloads.append({
-                    'paper_id': paper['id'],
                     'question_id': int(q['qid']),
                     'section': section_name,
                     'question_number': i + 1,
                     'marks': q.get('marks', 0)
                 })
-                
-                # Update usage metadata individually (Supabase RPC would be better but simple update loop for now)
-                # TODO: Optimize with RPC or Batch Update
-                try:
-                    supabase.table('questions').update({
-                        'usage_count': 1, # Should increment, but client simple update can't easily increment without read. keeping it simple.
-                        # Wait, we can't increment easily. Let's just update last_used_at for now to avoid read-write cycle lag.
-                        'last_used_at': datetime.utcnow().isoformat()
-                    }).eq('id', int(q['qid'])).execute()
-                except:
-                    pass
         
-        if gq_payloads:
-            supabase.table('generated_questions').insert(gq_payloads).execute()
+        saved = PaperGenerationService.persist_papers([(paper_payload, gq_payloads)])
+        if not saved:
+            return None, "Failed to save paper."
             
-        return paper, None
+        return saved[0], None
+
+    @staticmethod
+    def persist_papers(entries):
+        """
+        Save papers atomically through the create_generated_papers RPC: paper
+        headers, their generated_questions rows and the question usage
+        updates are written in one transaction.
+
+        Args:
+            entries: List of (generated_papers payload, question rows without paper_id)
+
+        Returns:
+            List of saved papers (each with its 'questions' rows), or None on failure
+        """
+        supabase = get_supabase_client()
+        try:
+            response = supabase.rpc('create_generated_papers', {
+                'papers': [
+                    {'paper': payload, 'questions': rows}
+                    for payload, rows in entries
+                ]
+            }).execute()
+        except Exception as e:
+            logger.error(f"Failed to save {len(entries)} generated papers: {str(e)}")
+            return None
+
+        # Mirror the usage bookkeeping in the cached banks (no refresh, same version)
+        used = {}
+        for payload, rows in entries:
+            used.setdefault(payload.get('course_id'), []).extend(row['question_id'] for row in rows)
+        for course_id, question_ids in used.items():
+            QuestionBankCache.record_usage(course_id, question_ids)
+        return response.data or None
 
     @staticmethod
     def get_history(course_id=None, faculty_id=None, page=1, limit=20):
-        """Get paginated history of papers."""
+        """Get paginated history of papers (summary columns only, newest first)."""
         supabase = get_supabase_client()
-        query = supabase.table('generated_papers').select("*", count='exact')
+        query = supabase.table('generated_papers').select(PAPER_HISTORY_COLUMNS, count='exact')
         
         if course_id:
             query = query.eq('course_id', course_id)
@@ -333,21 +886,44 @@ OUTPUT SCHEMA:
 
     @staticmethod
     def get_paper_details(paper_id):
-        """Get full paper details."""
+        """
+        Get full paper details in one round trip (get_paper_detail RPC).
+        Finalized papers are read from their stored paper_snapshot (one row,
+        immune to later question bank edits); papers without a snapshot are
+        built from their live questions on the server.
+        """
         supabase = get_supabase_client()
         
-        # Get Paper
-        paper_res = supabase.table('generated_papers').select("*").eq('id', paper_id).execute()
-        if not paper_res.data:
+        paper_res = supabase.rpc('get_paper_detail', {'p_paper_id': paper_id}).execute()
+        return paper_res.data or None
+
+    @staticmethod
+    def get_rendered_paper(paper_id):
+        """
+        Rendered JSON response body of a paper and its strong ETag.
+        Finalized papers are served from PaperResponseCache after a
+        primary-key probe of their updated_at stamp.
+
+        Returns:
+            Tuple of (body bytes, etag) or None if the paper does not exist
+        """
+        supabase = get_supabase_client()
+        probe = supabase.table('generated_papers').select('id, status, updated_at').eq('id', paper_id).execute()
+        if not probe.data:
             return None
-            
-        paper = paper_res.data[0]
-        
-        # Get/Join Generated Questions with actual Questions
-        # Supabase Join: generated_questions (*, questions (*))
-        gq_res = supabase.table('generated_questions').select(
-            "*, questions(*, course_outcomes(co_number), bloom_levels(name), difficulty_levels(name))"
-        ).eq('paper_id', paper_id).order('question_number').execute()
-        
-        paper['questions'] = gq_res.data
-        return paper
+
+        header = probe.data[0]
+        finalized = header.get('status') == 'finalized'
+        if finalized:
+            cached = PaperResponseCache.get(paper_id, header.get('updated_at'))
+            if cached:
+                return cached
+
+        paper = PaperGenerationService.get_paper_details(paper_id)
+        if not paper:
+            return None
+        body = current_app.json.dumps({'success': True, 'data': paper}).encode('utf-8')
+        etag = PaperResponseCache.make_etag(body)
+        if finalized:
+            PaperResponseCache.put(paper_id, paper.get('updated_at'), body, etag)
+        return body, etag
@@ -0,0 +1,50 @@
+"""
+Rendered paper response cache for Academic ERP Backend.
+
+Finalized papers are served from their rendered JSON body, keyed by paper
+id and the paper's `updated_at` stamp, together with a strong ETag (hash
+of the exact body). Revisions bump `updated_at`, so a stale body is never
+served even when another worker process did the revision.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+from flask import current_app
+
+_entries = OrderedDict()
+_lock = threading.Lock()
+
+
+class PaperResponseCache:
+    """Per-process LRU of rendered paper detail responses."""
+
+    @staticmethod
+    def make_etag(body):
+        return hashlib.sha256(body).hexdigest()
+
+    @staticmethod
+    def get(paper_id, version):
+        """Cached (body, etag) of a paper at the given updated_at stamp, or None."""
+        with _lock:
+            entry = _entries.get(paper_id)
+            if entry is None or entry[0] != version:
+                return None
+            _entries.move_to_end(paper_id)
+            return entry[1], entry[2]
+
+    @staticmethod
+    def put(paper_id, version, body, etag):
+        max_entries = current_app.config.get('PAPER_RESPONSE_CACHE_SIZE', 128)
+        if max_entries <= 0:
+            return
+        with _lock:
+            _entries[paper_id] = (version, body, etag)
+            _entries.move_to_end(paper_id)
+            while len(_entries) > max_entries:
+                _entries.popitem(last=False)
+
+    @staticmethod
+    def invalidate(paper_id):
+        with _lock:
+            _entries.pop(paper_id, None)
@@ -0,0 +1,166 @@
+"""
+Paper revision service for Academic ERP Backend.
+
+Swaps individual questions of a saved paper for the closest alternatives
+in the cached course bank, without regenerating the paper or calling the
+AI. Alternatives keep the question's marks and, as far as the bank
+allows, every coverage bucket the paper targets, so section marks and
+coverage are preserved. The paper's rotation policy keeps recently used
+questions out of the candidates, and each swap is written in one
+transaction by the swap_paper_questions RPC.
+"""
+import logging
+
+import numpy as np
+
+from services.paper_generation_service import PaperGenerationService
+from services.paper_response_cache import PaperResponseCache
+from services.paper_selector import PaperSelector
+from services.question_bank import BANK_COLUMNS
+from services.question_bank_cache import QuestionBankCache
+from services.question_rotation import QuestionRotation
+from utils.supabase_client import get_supabase_client
+
+logger = logging.getLogger(__name__)
+
+# A mismatched targeted bucket costs more than every untargeted facet together
+TARGETED_MISMATCH_COST = 10
+
+
+class PaperRevisionService:
+    """Service class for in-place paper revisions."""
+
+    @staticmethod
+    def replacement_costs(bank, old_position, candidates, targets):
+        """
+        Cost of replacing a bank row with each candidate row: mismatched
+        target buckets weigh TARGETED_MISMATCH_COST, other mismatched facet
+        levels weigh 1. Unknown old rows (no longer in the bank) cost 0.
+        """
+        costs = np.zeros(len(candidates), dtype=np.int64)
+        if old_position is None:
+            return costs
+
+        targeted = set()
+        for target in targets:
+            codes = target.bucket_codes(bank)
+            costs += TARGETED_MISMATCH_COST * (codes[candidates] != codes[old_position])
+            targeted.add(target.facet)
+        for facet, levels in bank.facets.items():
+            if facet not in targeted:
+                costs += levels[candidates] != levels[old_position]
+        return costs
+
+    @staticmethod
+    def swap_questions(paper_id, generated_question_ids, faculty_id=None):
+        """
+        Replace the given generated_questions rows of a paper.
+
+        Args:
+            paper_id: Paper to revise
+            generated_question_ids: generated_questions ids to replace
+            faculty_id: Restrict to papers of this faculty (None for admins)
+
+        Returns:
+            Tuple of (result dict with the revised paper and swaps, error message);
+            (None, None) when the paper does not exist
+        """
+        supabase = get_supabase_client()
+
+        # Questions are embedded whatever their status: kept questions that left
+        # the cached bank (deactivated since) still count in the analytics
+        query = supabase.table('generated_papers').select(
+            "id, course_id, faculty_id, generation_params, "
+            f"generated_questions(id, paper_id, question_id, section, question_number, marks, questions({BANK_COLUMNS}))"
+        ).eq('id', paper_id)
+        if faculty_id:
+            query = query.eq('faculty_id', faculty_id)
+        paper_res = query.execute()
+        if not paper_res.data:
+            return None, None
+
+        paper = paper_res.data[0]
+        rows = paper.get('generated_questions') or []
+        wanted = {int(i) for i in generated_question_ids}
+        replaced_rows = [r for r in rows if r['id'] in wanted]
+        if len(replaced_rows) != len(wanted):
+            return None, "Some questions do not belong to this paper."
+
+        bank = QuestionBankCache.get_snapshot(paper['course_id']).bank
+        params = paper.get('generation_params') or {}
+        targets = PaperSelector.build_targets(params)
+
+        # Questions already on the paper (kept or newly chosen) are never candidates;
+        # the paper's rotation policy applies as it did at generation time
+        in_use = bank.exclusion_mask([r['question_id'] for r in rows])
+        rotation = QuestionRotation.plan(paper['course_id'], bank, params)
+        updates, swaps = [], []
+        for row in sorted(replaced_rows, key=lambda r: (r['section'], r['question_number'])):
+            same_marks = in_use & (bank.marks == row['marks'])
+            candidates = np.flatnonzero(same_marks & ~rotation.excluded)
+            if not len(candidates):
+                candidates = np.flatnonzero(same_marks)
+                if len(candidates) and not rotation.info.get('relaxed'):
+                    rotation.relaxed(bank)
+            if not len(candidates):
+                return None, f"No alternative {row['marks']}-mark question is available."
+
+            old = bank.positions_of([row['question_id']])
+            old_position = int(old[0]) if len(old) else None
+            costs = PaperRevisionService.replacement_costs(bank, old_position, candidates, targets)
+            pick = np.lexsort((
+                bank.last_used_at[candidates],
+                bank.usage_count[candidates],
+                rotation.recency[candidates],
+                costs
+            ))[0]
+            best = candidates[pick]
+
+            in_use[best] = False
+            new_question_id = int(bank.ids[best])
+            updates.append({**row, 'question_id': new_question_id})
+            swaps.append({
+                'generated_question_id': row['id'],
+                'old_question_id': row['question_id'],
+                'new_question_id': new_question_id,
+                'preserved_coverage': old_position is not None and int(costs[pick]) < TARGETED_MISMATCH_COST
+            })
+
+        # Refresh precomputed analytics and the deviation report over the paper's
+        # own questions: new ones from the bank, kept ones from their embedded rows
+        replaced = {u['id']: u['question_id'] for u in updates}
+        paper_bank = bank.take(bank.positions_of(list(replaced.values()))).upsert(
+            [r['questions'] for r in rows if r['id'] not in replaced and r.get('questions')]
+        )
+        sections = {}
+        for r in sorted(rows, key=lambda r: r['id']):
+            position = paper_bank.positions_of([replaced.get(r['id'], r['question_id'])])
+            sections.setdefault(r['section'], []).extend(paper_bank.entries(position, include_text=False))
+        entries = [q for qs in sections.values() for q in qs]
+        report = PaperSelector.evaluate(
+            paper_bank, [{'name': name, 'questions': qs} for name, qs in sections.items()], params, targets
+        )
+        report['rotation'] = rotation.info
+
+        # Rows, usage, analytics and snapshot are written in one transaction
+        try:
+            supabase.rpc('swap_paper_questions', {
+                'p_paper_id': paper_id,
+                'p_rows': [{'id': u['id'], 'question_id': u['question_id']} for u in updates],
+                'p_paper': {
+                    **PaperGenerationService.paper_analytics(entries),
+                    'generation_params': {**params, 'report': {**params.get('report', {}), **report}}
+                }
+            }).execute()
+        except Exception as e:
+            logger.error(f"Failed to swap questions on paper {paper_id}: {str(e)}")
+            return None, "Failed to swap questions."
+
+        QuestionBankCache.record_usage(paper['course_id'], list(replaced.values()))
+        PaperResponseCache.invalidate(paper_id)
+
+        logger.info(f"Swapped {len(swaps)} questions on paper {paper_id}")
+        return {
+            'paper': PaperGenerationService.get_paper_details(paper_id),
+            'swaps': swaps
+        }, None
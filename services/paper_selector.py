@@ -0,0 +1,567 @@
+"""
+Deterministic paper selection engine for Academic ERP Backend.
+
+Formulates a blueprint as an integer program over the question bank:
+every section must receive exactly `total_questions` questions of
+`marks_per_question` marks, and the marks share of each unit, CO, Bloom
+level and difficulty should match the requested coverage targets.
+
+Questions that are interchangeable for the objective (same marks and same
+target bucket in every dimension) are aggregated into facet cells, which
+keeps the problem small enough to solve in-process in milliseconds with a
+greedy construction followed by a bounded exchange search (single-slot and
+pair moves). Small instances are then solved exactly by enumerating cell
+combinations. Pools, buckets and scores are computed as vectorized
+operations on a QuestionBank.
+"""
+import itertools
+import math
+import zlib
+
+import numpy as np
+
+# (request parameter, QuestionBank facet)
+COVERAGE_DIMENSIONS = (
+    ('unit_coverage', 'unit'),
+    ('co_coverage', 'co'),
+    ('bloom_distribution', 'bloom'),
+    ('difficulty_distribution', 'difficulty'),
+)
+
+DEFAULT_SECTIONS = [
+    {"name": "Part A", "marks_per_question": 10, "total_questions": 10}
+]
+
+OTHER_BUCKET = -1
+
+
+class CoverageTarget:
+    """Normalized targets for one coverage dimension."""
+
+    def __init__(self, param, facet, raw_targets):
+        self.param = param
+        self.facet = facet
+        self.keys = []
+        self.shares = []
+
+        weights = []
+        for key, value in (raw_targets or {}).items():
+            try:
+                weight = float(value)
+            except (TypeError, ValueError):
+                continue
+            if weight <= 0:
+                continue
+            self.keys.append(str(key))
+            weights.append(weight)
+
+        total = sum(weights)
+        self.shares = [w / total for w in weights] if total > 0 else []
+
+    @property
+    def active(self):
+        return bool(self.shares)
+
+    def bucket_codes(self, bank):
+        """Index of the first target key each bank row falls into, or OTHER_BUCKET."""
+        codes = np.full(len(bank), OTHER_BUCKET, dtype=np.int16)
+        levels = bank.facets[self.facet]
+        for i, key in enumerate(self.keys):
+            hit = (codes == OTHER_BUCKET) & np.isin(levels, bank.facet_levels(self.facet, key))
+            codes[hit] = i
+        return codes
+
+
+class PaperSelector:
+    """Optimizing deterministic selector for section and coverage targets."""
+
+    MAX_EXCHANGE_ROUNDS = 200
+    # Max cell combinations enumerated exactly after the exchange search
+    EXACT_SEARCH_LIMIT = 20000
+    # Cells per slot tried by pair moves (the cheapest to add on their own)
+    PAIR_CANDIDATES = 24
+
+    @staticmethod
+    def build_targets(data):
+        """Build the active coverage targets for a generation request."""
+        targets = [
+            CoverageTarget(param, facet, data.get(param))
+            for param, facet in COVERAGE_DIMENSIONS
+        ]
+        return [t for t in targets if t.active]
+
+    @staticmethod
+    def get_sections(data):
+        """Return the requested section layout, falling back to the legacy default."""
+        return data.get('sections') or DEFAULT_SECTIONS
+
+    @staticmethod
+    def _rng(seed):
+        """Seeded generator for tie-breaking; unseeded requests vary between runs."""
+        if isinstance(seed, str):
+            seed = zlib.crc32(seed.encode('utf-8'))
+        return np.random.default_rng(seed)
+
+    @staticmethod
+    def select(bank, data, exclude_ids=None, tolerance=10.0, recency=None, locked=None):
+        """
+        Select questions for every section of the blueprint.
+
+        Args:
+            bank: QuestionBank for the course
+            data: Generation parameters (sections and coverage targets)
+            exclude_ids: Optional iterable of question ids that must not be used
+            tolerance: Max coverage deviation (percentage points) still considered on target
+            recency: Optional per-row penalty aligned with the bank (higher = used more
+                recently); rows with lower penalties are preferred within a cell
+            locked: Optional list (per section) of question ids already placed in that
+                section; they count towards the targets and only the gaps are filled
+
+        Returns:
+            Dict with 'sections' (selected entries per section) and 'report'
+            (per-constraint deviation report).
+        """
+        targets = PaperSelector.build_targets(data)
+        sections = PaperSelector.get_sections(data)
+        section_marks = [int(sp['marks_per_question']) for sp in sections]
+        locked_positions = [
+            bank.positions_of((locked[i] if locked and i < len(locked) else None) or [])
+            for i in range(len(sections))
+        ]
+        locked_ids = [int(q) for pos in locked_positions for q in bank.ids[pos].tolist()]
+
+        # Section pools: rows with a requested marks value, minus exclusions and locked rows
+        eligible = bank.exclusion_mask(list(exclude_ids or []) + locked_ids) & bank.marks_mask(set(section_marks))
+        rows = np.flatnonzero(eligible)
+
+        # Aggregate interchangeable rows into facet cells (mixed-radix key per row)
+        dims = len(targets)
+        width = 1 + max((len(t.keys) for t in targets), default=0)
+        bucket_codes = [target.bucket_codes(bank).astype(np.int64) + 1 for target in targets]
+        row_keys = bank.marks[rows].astype(np.int64)
+        for codes in bucket_codes:
+            row_keys = row_keys * width + codes[rows]
+        cell_ids, cell_of_row, cell_sizes = np.unique(
+            row_keys, return_inverse=True, return_counts=True
+        )
+        cell_of_row = cell_of_row.reshape(-1)
+        cell_buckets = np.empty((len(cell_ids), dims), dtype=np.int64)  # 0 = OTHER_BUCKET
+        remainder = cell_ids.copy()
+        for d in range(dims - 1, -1, -1):
+            cell_buckets[:, d] = remainder % width
+            remainder //= width
+        cell_marks = remainder
+
+        # Order rows by cell, then prefer not recently rotated, rarely / least
+        # recently used, then seeded shuffle
+        rng = PaperSelector._rng(data.get('seed'))
+        penalty = np.zeros(len(rows)) if recency is None else np.asarray(recency)[rows]
+        order = np.lexsort((
+            rng.random(len(rows)),
+            bank.last_used_at[rows],
+            bank.usage_count[rows],
+            penalty,
+            cell_of_row
+        ))
+        cell_starts = np.concatenate(([0], np.cumsum(cell_sizes)[:-1])).astype(np.int64)
+        capacity = cell_sizes.astype(np.int64)
+
+        # Size each section against the remaining pool of its marks value
+        remaining_by_marks = {}
+        for marks, size in zip(cell_marks.tolist(), cell_sizes.tolist()):
+            remaining_by_marks[marks] = remaining_by_marks.get(marks, 0) + size
+        takes = []
+        for sp, marks, fixed in zip(sections, section_marks, locked_positions):
+            gap = max(0, int(sp['total_questions']) - len(fixed))
+            take = min(gap, remaining_by_marks.get(marks, 0))
+            remaining_by_marks[marks] = remaining_by_marks.get(marks, 0) - take
+            takes.append(take)
+
+        # Locked questions count towards the paper total and their buckets up front
+        locked_all = np.concatenate(locked_positions).astype(np.int64) if locked_positions else np.empty(0, np.int64)
+        locked_marks = bank.marks[locked_all].astype(np.float64)
+        total_marks = sum(m * t for m, t in zip(section_marks, takes)) + float(locked_marks.sum())
+        desired = np.zeros((dims, width))
+        for d, target in enumerate(targets):
+            desired[d, 1:1 + len(target.shares)] = np.asarray(target.shares) * total_marks
+        achieved = np.zeros((dims, width))
+        for d, codes in enumerate(bucket_codes):
+            np.add.at(achieved[d], codes[locked_all], locked_marks)
+        dim_index = np.arange(dims)
+
+        cells_by_marks = {
+            marks: np.flatnonzero(cell_marks == marks) for marks in set(section_marks)
+        }
+
+        def add_cost(cells, marks):
+            """Change in total absolute deviation if one question of each cell were added."""
+            if not dims:
+                return np.zeros(len(cells))
+            current = achieved[dim_index, cell_buckets[cells]]
+            goal = desired[dim_index, cell_buckets[cells]]
+            return (np.abs(current + marks - goal) - np.abs(current - goal)).sum(axis=1)
+
+        def apply(cell, marks, sign):
+            achieved[dim_index, cell_buckets[cell]] += sign * marks
+
+        def best_cell(marks, exclude=-1):
+            """Open cell of the given marks value with the lowest added deviation."""
+            candidates = cells_by_marks[marks]
+            candidates = candidates[(capacity[candidates] > 0) & (candidates != exclude)]
+            if not len(candidates):
+                return None, None
+            costs = add_cost(candidates, marks)
+            best = int(np.argmin(costs))
+            return int(candidates[best]), float(costs[best])
+
+        # Greedy construction: fill each slot with the cell that best reduces deviation
+        slots = []
+        for index, (marks, take) in enumerate(zip(section_marks, takes)):
+            for _ in range(take):
+                cell, _ = best_cell(marks)
+                capacity[cell] -= 1
+                apply(cell, marks, 1)
+                slots.append([index, cell])
+
+        def pair_costs(first, first_marks, second, second_marks):
+            """
+            Change in total absolute deviation if one question of a cell in
+            `first` and one of a cell in `second` were added together
+            (matrix over first x second; shared buckets interact).
+            """
+            if not dims:
+                return np.zeros((len(first), len(second)))
+            buckets = cell_buckets[first]
+            current = achieved[dim_index, buckets]
+            goal = desired[dim_index, buckets]
+            same = buckets[:, None, :] == cell_buckets[second][None, :, :]
+            current, goal = current[:, None, :], goal[:, None, :]
+            joint = (
+                np.abs(current + first_marks + second_marks - goal) - np.abs(current + first_marks - goal)
+                - np.abs(current + second_marks - goal) + np.abs(current - goal)
+            )
+            return (
+                add_cost(first, first_marks)[:, None] + add_cost(second, second_marks)[None, :]
+                + (joint * same).sum(axis=2)
+            )
+
+        def on_target():
+            return not dims or np.abs(achieved - desired).sum() < 1e-9
+
+        def single_exchange():
+            """Move single slots to better cells; True if any move improved."""
+            improved = False
+            for slot in slots:
+                cell = slot[1]
+                marks = int(cell_marks[cell])
+                apply(cell, marks, -1)
+                restore = float(add_cost(np.asarray([cell]), marks)[0])
+                other, cost = best_cell(marks, exclude=cell)
+                if other is not None and cost < restore - 1e-9:
+                    capacity[cell] += 1
+                    capacity[other] -= 1
+                    apply(other, marks, 1)
+                    slot[1] = other
+                    improved = True
+                else:
+                    apply(cell, marks, 1)
+            return improved
+
+        def promising(marks):
+            """Open cells of a marks value, the PAIR_CANDIDATES cheapest to add on their own."""
+            candidates = cells_by_marks[marks]
+            candidates = candidates[capacity[candidates] > 0]
+            if len(candidates) > PaperSelector.PAIR_CANDIDATES:
+                costs = add_cost(candidates, marks)
+                candidates = candidates[np.argsort(costs, kind='stable')[:PaperSelector.PAIR_CANDIDATES]]
+            return candidates
+
+        def pair_exchange():
+            """
+            Move two slots at once (escapes optima where no single move helps,
+            e.g. two questions swapping buckets); True after the first
+            improving move.
+            """
+            occupied = np.flatnonzero(cell_sizes - capacity)
+            for i, first in enumerate(occupied.tolist()):
+                for second in occupied[i:].tolist():
+                    if first == second and cell_sizes[first] - capacity[first] < 2:
+                        continue
+                    first_marks, second_marks = int(cell_marks[first]), int(cell_marks[second])
+                    apply(first, first_marks, -1)
+                    apply(second, second_marks, -1)
+                    capacity[first] += 1
+                    capacity[second] += 1
+
+                    restore = float(pair_costs(
+                        np.asarray([first]), first_marks, np.asarray([second]), second_marks
+                    )[0, 0])
+                    firsts = promising(first_marks)
+                    seconds = promising(second_marks)
+                    costs = pair_costs(firsts, first_marks, seconds, second_marks)
+                    costs[(firsts[:, None] == seconds[None, :]) & (capacity[firsts][:, None] < 2)] = np.inf
+                    a, b = np.unravel_index(int(np.argmin(costs)), costs.shape)
+
+                    if costs[a, b] < restore - 1e-9:
+                        x = next(k for k, slot in enumerate(slots) if slot[1] == first)
+                        y = next(k for k, slot in enumerate(slots) if slot[1] == second and k != x)
+                        slots[x][1], slots[y][1] = int(firsts[a]), int(seconds[b])
+                        for cell, marks in ((slots[x][1], first_marks), (slots[y][1], second_marks)):
+                            capacity[cell] -= 1
+                            apply(cell, marks, 1)
+                        return True
+
+                    capacity[first] -= 1
+                    capacity[second] -= 1
+                    apply(first, first_marks, 1)
+                    apply(second, second_marks, 1)
+            return False
+
+        # Exchange search: single-slot moves, then pair moves when no single
+        # move improves, until neither does
+        for _ in range(PaperSelector.MAX_EXCHANGE_ROUNDS):
+            if not single_exchange() and (on_target() or not pair_exchange()):
+                break
+
+        # Small instances: enumerate every cell combination and keep the
+        # exchange result unless an exact optimum beats it
+        if dims and slots:
+            PaperSelector._exact_search(
+                slots, section_marks, cells_by_marks, cell_sizes, capacity,
+                cell_buckets, achieved, desired, width
+            )
+
+        # Materialize: each slot takes the most preferred remaining row of its cell
+        cursors = np.zeros(len(cell_ids), dtype=np.int64)
+        positions = [pos.tolist() for pos in locked_positions]
+        for index, cell in slots:
+            positions[index].append(rows[order[cell_starts[cell] + cursors[cell]]])
+            cursors[cell] += 1
+
+        result_sections = [
+            {
+                'name': sp['name'],
+                'marks_per_question': marks,
+                'required': int(sp['total_questions']),
+                'questions': bank.entries(picked)
+            }
+            for sp, marks, picked in zip(sections, section_marks, positions)
+        ]
+
+        return {
+            'sections': result_sections,
+            'report': PaperSelector.evaluate(bank, result_sections, data, targets, tolerance)
+        }
+
+    @staticmethod
+    def _exact_search(slots, section_marks, cells_by_marks, cell_sizes, capacity,
+                      cell_buckets, achieved, desired, width):
+        """
+        Exhaustive search over how many questions each cell contributes, per
+        marks value, when there are at most EXACT_SEARCH_LIMIT combinations.
+        Updates slots, capacity and achieved in place if the optimum has a
+        lower total deviation than the current assignment.
+        """
+        dims = len(desired)
+        dim_index = np.arange(dims)
+        groups = []
+        combinations = 1
+        for marks in sorted(set(section_marks)):
+            cells = cells_by_marks[marks]
+            need = sum(1 for _, cell in slots if cell in set(cells.tolist()))
+            if not need:
+                continue
+            combinations *= math.comb(len(cells) + need - 1, need)
+            if combinations > PaperSelector.EXACT_SEARCH_LIMIT:
+                return
+            groups.append((marks, cells, need))
+
+        # Deviation state without the slots (locked questions only)
+        base = achieved.copy()
+        for _, cell in slots:
+            for marks, cells, _ in groups:
+                if cell in cells:
+                    base[dim_index, cell_buckets[cell]] -= marks
+
+        # Per group: feasible count vectors and their marks per (dimension, bucket)
+        counts_by_group, contributions = [], None
+        for marks, cells, need in groups:
+            picks = np.asarray(list(itertools.combinations_with_replacement(range(len(cells)), need)))
+            counts = np.zeros((len(picks), len(cells)), dtype=np.int64)
+            np.add.at(counts, (np.arange(len(picks))[:, None], picks), 1)
+            counts = counts[(counts <= cell_sizes[cells]).all(axis=1)]
+            per_cell = np.zeros((len(cells), dims, width))
+            per_cell[np.arange(len(cells))[:, None], dim_index, cell_buckets[cells]] = marks
+            added = counts @ per_cell.reshape(len(cells), -1)
+            counts_by_group.append(counts)
+            contributions = added if contributions is None else (
+                contributions[:, None, :] + added[None, :, :]
+            ).reshape(-1, dims * width)
+
+        deviation = np.abs(base.reshape(-1) + contributions - desired.reshape(-1)).sum(axis=1)
+        best = int(np.argmin(deviation))
+        if deviation[best] >= np.abs(achieved - desired).sum() - 1e-9:
+            return
+
+        choice = np.unravel_index(best, [len(counts) for counts in counts_by_group])
+        for (marks, cells, _), counts, row in zip(groups, counts_by_group, choice):
+            chosen = np.repeat(cells, counts[row]).tolist()
+            for slot in slots:
+                if int(slot[1]) in set(cells.tolist()):
+                    slot[1] = chosen.pop()
+        used = np.bincount([cell for _, cell in slots], minlength=len(cell_sizes))
+        capacity[:] = cell_sizes - used
+        achieved[:] = base + contributions[best].reshape(dims, width)
+
+    @staticmethod
+    def evaluate(bank, sections, data, targets=None, tolerance=10.0):
+        """
+        Build a per-constraint deviation report for a selection.
+
+        Coverage deviations are expressed in percentage points of total marks.
+        A dimension's overall deviation is the share of marks that would have
+        to move between buckets to meet its targets exactly (0-100).
+        """
+        if targets is None:
+            targets = PaperSelector.build_targets(data)
+
+        qids = [q['qid'] for section in sections for q in section['questions']]
+        selected = bank.take(bank.positions_of(qids))
+        marks = selected.marks.astype(np.float64)
+        total = float(marks.sum())
+
+        section_report = []
+        for section in sections:
+            count = len(section['questions'])
+            required = section.get('required', count)
+            section_report.append({
+                'name': section['name'],
+                'marks_per_question': section.get('marks_per_question'),
+                'required': required,
+                'selected': count,
+                'shortfall': max(0, required - count)
+            })
+
+        coverage_report = {}
+        for target in targets:
+            codes = target.bucket_codes(selected).astype(np.int64) + 1
+            sums = np.bincount(codes, weights=marks, minlength=len(target.keys) + 1)
+            achieved = 100.0 * sums / total if total else np.zeros_like(sums)
+            goals = 100.0 * np.asarray(target.shares)
+            diffs = achieved[1:] - goals
+
+            coverage_report[target.param] = {
+                'deviation': round(float((np.abs(diffs).sum() + achieved[0]) / 2), 2),
+                'unmatched': round(float(achieved[0]), 2),
+                'buckets': {
+                    key: {
+                        'target': round(float(goals[i]), 2),
+                        'achieved': round(float(achieved[i + 1]), 2),
+                        'deviation': round(float(diffs[i]), 2)
+                    }
+                    for i, key in enumerate(target.keys)
+                }
+            }
+
+        feasible = all(s['shortfall'] == 0 for s in section_report)
+        within_tolerance = feasible and all(
+            c['deviation'] <= tolerance for c in coverage_report.values()
+        )
+
+        return {
+            'total_marks': {'requested': data.get('total_marks'), 'achieved': int(total)},
+            'sections': section_report,
+            'coverage': coverage_report,
+            'feasible': feasible,
+            'within_tolerance': within_tolerance
+        }
+
+    @staticmethod
+    def feasibility(bank, counts, data, tolerance=10.0):
+        """
+        Check a blueprint against facet counts without selecting anything.
+
+        Sections are sized in order against the questions of their marks
+        value. For every coverage bucket the achievable share of marks is
+        bounded from both sides: at most every needed question of a marks
+        value falls in the bucket, at least those that cannot come from
+        other buckets do. Targets outside these bounds are infeasible by the
+        reported number of marks / percentage points.
+
+        Args:
+            bank: QuestionBank (used for level labels only)
+            counts: Facet counts of the pool, as from QuestionBank.facet_counts()
+            data: Blueprint (sections and coverage targets)
+            tolerance: Max coverage deviation (percentage points) still considered on target
+        """
+        targets = PaperSelector.build_targets(data)
+        sections = PaperSelector.get_sections(data)
+
+        remaining = dict(counts['marks'])
+        need = {}
+        section_report = []
+        for sp in sections:
+            marks = int(sp['marks_per_question'])
+            required = int(sp['total_questions'])
+            available = remaining.get(marks, 0)
+            take = min(required, available)
+            remaining[marks] = available - take
+            need[marks] = need.get(marks, 0) + take
+            section_report.append({
+                'name': sp['name'],
+                'marks_per_question': marks,
+                'required': required,
+                'available': available,
+                'shortfall': required - take
+            })
+
+        total = sum(m * n for m, n in need.items())
+        coverage_report = {}
+        for target in targets:
+            claimed = set()
+            buckets = {}
+            short_points = excess_points = 0.0
+            for key, share in zip(target.keys, target.shares):
+                # Rows count towards the first key they match, as in bucket_codes
+                levels = set(bank.facet_levels(target.facet, key).tolist()) - claimed
+                claimed |= levels
+
+                max_marks = min_marks = 0
+                for marks, needed in need.items():
+                    inside = sum(counts[target.facet].get((marks, level), 0) for level in levels)
+                    outside = counts['marks'].get(marks, 0) - inside
+                    max_marks += marks * min(needed, inside)
+                    min_marks += marks * max(0, needed - outside)
+
+                required = share * total
+                shortfall = max(0.0, required - max_marks)
+                excess = max(0.0, min_marks - required)
+                to_points = (100.0 / total) if total else 0.0
+                short_points += shortfall * to_points
+                excess_points += excess * to_points
+                buckets[key] = {
+                    'target': round(100.0 * share, 2),
+                    'required_marks': round(required, 2),
+                    'max_marks': max_marks,
+                    'min_marks': min_marks,
+                    'shortfall_marks': round(shortfall, 2),
+                    'excess_marks': round(excess, 2),
+                    'feasible': shortfall < 1e-9 and excess < 1e-9
+                }
+            coverage_report[target.param] = {
+                'min_deviation': round(max(short_points, excess_points), 2),
+                'buckets': buckets
+            }
+
+        sections_ok = all(s['shortfall'] == 0 for s in section_report)
+        return {
+            'total_marks': {'requested': data.get('total_marks'), 'achievable': total},
+            'sections': section_report,
+            'coverage': coverage_report,
+            'feasible': sections_ok and all(
+                b['feasible'] for c in coverage_report.values() for b in c['buckets'].values()
+            ),
+            'within_tolerance': sections_ok and all(
+                c['min_deviation'] <= tolerance for c in coverage_report.values()
+            )
+        }
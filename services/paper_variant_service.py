@@ -0,0 +1,263 @@
+"""
+Seat-specific paper variants for Academic ERP Backend.
+
+For large exams every seat gets its own variant of a generated paper:
+questions are shuffled within their section and MCQ options are shuffled
+per question, with a matching answer key. Permutations are derived from
+(seed, seat number, question id, option index) through a counter-based
+hash (splitmix64) and argsort, computed for a whole batch of seats at
+once with NumPy. A seat's variant therefore depends only on the seed and
+its seat number, never on which batch or request produced it, and
+variants are streamed batch by batch instead of being built in memory.
+"""
+import csv
+import io
+import json
+import logging
+
+import numpy as np
+
+from services.paper_export_service import PaperExportService
+from services.paper_generation_service import PaperGenerationService
+
+logger = logging.getLogger(__name__)
+
+VARIANT_FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+VARIANT_CONTENTS = ('keys', 'variants')
+
+# Seats permuted per NumPy batch
+SEAT_BATCH_SIZE = 256
+
+_GOLDEN_GAMMA = np.uint64(0x9E3779B97F4A7C15)
+_MIX_1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX_2 = np.uint64(0x94D049BB133111EB)
+
+
+def _splitmix64(x):
+    """splitmix64 finalizer over a uint64 array (wrapping arithmetic)."""
+    x = x + _GOLDEN_GAMMA
+    x = (x ^ (x >> np.uint64(30))) * _MIX_1
+    x = (x ^ (x >> np.uint64(27))) * _MIX_2
+    return x ^ (x >> np.uint64(31))
+
+
+def _hash_keys(seed, *coordinates):
+    """Broadcast hash of seed and integer coordinate arrays, one uint64 per cell."""
+    h = _splitmix64(np.asarray([seed % (1 << 64)], dtype=np.uint64))
+    for values in coordinates:
+        h = _splitmix64(h ^ np.asarray(values, dtype=np.uint64))
+    return h
+
+
+def _option_label(index):
+    return chr(ord('A') + index) if index < 26 else str(index + 1)
+
+
+class VariantPlan:
+    """Sections, questions and MCQ options of a paper, ready to be permuted per seat."""
+
+    def __init__(self, paper_id, seed, sections):
+        self.paper_id = paper_id
+        self.seed = seed
+        # [{'name', 'questions': [{'question_id', 'marks', 'text', 'options', 'correct'}]}]
+        self.sections = sections
+
+    def permute(self, seats):
+        """
+        Permutations for a batch of seats.
+
+        Returns:
+            Per section, a tuple of (order, options): order[s, j] is the
+            index of the question placed j-th for seat s; options maps a
+            question index to (perm, answer) where perm[s, j] is the original
+            option index shown j-th and answer[s] the new index of the
+            correct option (-1 if unknown)
+        """
+        seats = np.asarray(seats, dtype=np.uint64)
+        result = []
+        for section in self.sections:
+            questions = section['questions']
+            qids = np.asarray([q['question_id'] for q in questions], dtype=np.uint64)
+            order = np.argsort(_hash_keys(self.seed, seats[:, None], qids[None, :]), axis=1, kind='stable')
+
+            # One vectorized argsort per group of MCQs with the same option count
+            options = {}
+            groups = {}
+            for index, question in enumerate(questions):
+                if question['options']:
+                    groups.setdefault(len(question['options']), []).append(index)
+            for count, indices in groups.items():
+                positions = np.arange(count, dtype=np.uint64)
+                keys = _hash_keys(
+                    self.seed, seats[:, None, None], qids[indices][None, :, None], positions[None, None, :]
+                )
+                perms = np.argsort(keys, axis=2, kind='stable')
+                correct = np.asarray([questions[i]['correct'] for i in indices])
+                answers = np.where(correct >= 0, np.argmax(perms == correct[None, :, None], axis=2), -1)
+                for column, index in enumerate(indices):
+                    options[index] = (perms[:, column, :], answers[:, column])
+            result.append((order, options))
+        return result
+
+
+class PaperVariantService:
+    """Service class for per-seat shuffled paper variants and answer keys."""
+
+    @staticmethod
+    def correct_option(options, correct_answer):
+        """Index of the correct option given as a label, 1-based number or option text; -1 if unknown."""
+        if correct_answer is None or not options:
+            return -1
+        answer = str(correct_answer).strip()
+        for index, (label, text) in enumerate(options):
+            if answer.lower() in (label.lower(), _option_label(index).lower()):
+                return index
+        if answer.isdigit() and 1 <= int(answer) <= len(options):
+            return int(answer) - 1
+        for index, (label, text) in enumerate(options):
+            if answer.lower() == text.strip().lower():
+                return index
+        return -1
+
+    @staticmethod
+    def build_plan(paper_id, seed=None):
+        """
+        Variant plan of a saved paper (read from its snapshot).
+
+        Args:
+            paper_id: Paper to derive variants from
+            seed: Integer seed (defaults to the paper id)
+
+        Returns:
+            VariantPlan or None when the paper does not exist
+        """
+        paper = PaperGenerationService.get_paper_details(paper_id)
+        if not paper:
+            return None
+
+        sections = {}
+        for row in paper.get('questions') or []:
+            question = row.get('questions') or {}
+            options = []
+            if question.get('question_type') == 'mcq':
+                options = PaperExportService.option_pairs(question.get('options'))
+            sections.setdefault(row['section'], []).append((row['question_number'], {
+                'question_id': row['question_id'],
+                'marks': row['marks'],
+                'text': question.get('question_text') or '',
+                'options': options,
+                'correct': PaperVariantService.correct_option(options, question.get('correct_answer')),
+            }))
+
+        ordered = [
+            {'name': name, 'questions': [q for _, q in sorted(rows, key=lambda r: r[0])]}
+            for name, rows in sections.items()
+        ]
+        unresolved = sum(1 for s in ordered for q in s['questions'] if q['options'] and q['correct'] < 0)
+        if unresolved:
+            logger.warning(f"Paper {paper_id}: {unresolved} MCQs have no resolvable correct_answer")
+        return VariantPlan(paper_id, paper_id if seed is None else seed, ordered)
+
+    @staticmethod
+    def iter_seats(plan, start_seat, seat_count, batch_size=SEAT_BATCH_SIZE):
+        """
+        Yield (seat, sections) per seat, where sections is a list of
+        (section name, [(number, question, option order, answer index)]).
+        """
+        end = start_seat + seat_count
+        for batch_start in range(start_seat, end, batch_size):
+            seats = np.arange(batch_start, min(batch_start + batch_size, end))
+            permutations = plan.permute(seats)
+            for s, seat in enumerate(seats.tolist()):
+                sections = []
+                for section, (order, options) in zip(plan.sections, permutations):
+                    placed = []
+                    for number, index in enumerate(order[s].tolist(), 1):
+                        question = section['questions'][index]
+                        if index in options:
+                            perm, answers = options[index]
+                            placed.append((number, question, perm[s].tolist(), int(answers[s])))
+                        else:
+                            placed.append((number, question, None, -1))
+                    sections.append((section['name'], placed))
+                yield seat, sections
+
+    @staticmethod
+    def _csv_rows(plan, start_seat, seat_count, content):
+        if content == 'keys':
+            yield ['seat', 'section', 'number', 'question_id', 'answer']
+        else:
+            yield ['seat', 'section', 'number', 'question_id', 'marks', 'option_order']
+
+        for seat, sections in PaperVariantService.iter_seats(plan, start_seat, seat_count):
+            for name, placed in sections:
+                for number, question, perm, answer in placed:
+                    if content == 'keys':
+                        if perm is not None:
+                            yield [seat, name, number, question['question_id'],
+                                   _option_label(answer) if answer >= 0 else '']
+                    else:
+                        order = '|'.join(question['options'][i][0] for i in perm) if perm is not None else ''
+                        yield [seat, name, number, question['question_id'], question['marks'], order]
+
+    @staticmethod
+    def _ndjson_records(plan, start_seat, seat_count, content):
+        for seat, sections in PaperVariantService.iter_seats(plan, start_seat, seat_count):
+            if content == 'keys':
+                yield {
+                    'seat': seat,
+                    'answers': [
+                        {'section': name, 'number': number, 'question_id': question['question_id'],
+                         'answer': _option_label(answer) if answer >= 0 else None}
+                        for name, placed in sections
+                        for number, question, perm, answer in placed
+                        if perm is not None
+                    ]
+                }
+            else:
+                yield {
+                    'seat': seat,
+                    'paper_id': plan.paper_id,
+                    'sections': [
+                        {'name': name, 'questions': [
+                            {
+                                'number': number,
+                                'question_id': question['question_id'],
+                                'marks': question['marks'],
+                                'text': question['text'],
+                                **({'options': [
+                                    {'label': _option_label(j), 'text': question['options'][i][1]}
+                                    for j, i in enumerate(perm)
+                                ]} if perm is not None else {})
+                            }
+                            for number, question, perm, answer in placed
+                        ]}
+                        for name, placed in sections
+                    ]
+                }
+
+    @staticmethod
+    def stream(plan, start_seat, seat_count, fmt='ndjson', content='keys'):
+        """
+        Stream variants or answer keys of a range of seats as CSV or NDJSON
+        text chunks, one chunk per batch of seats' rows.
+        """
+        if fmt == 'csv':
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for i, row in enumerate(PaperVariantService._csv_rows(plan, start_seat, seat_count, content)):
+                writer.writerow(row)
+                if i % 1024 == 1023:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+            yield buffer.getvalue()
+        else:
+            lines = []
+            for record in PaperVariantService._ndjson_records(plan, start_seat, seat_count, content):
+                lines.append(json.dumps(record, ensure_ascii=False))
+                if len(lines) == SEAT_BATCH_SIZE:
+                    yield '\n'.join(lines) + '\n'
+                    lines = []
+            if lines:
+                yield '\n'.join(lines) + '\n'
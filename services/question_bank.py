@@ -0,0 +1,281 @@
+"""
+Columnar question bank for Academic ERP Backend.
+
+Holds a course's question bank as parallel NumPy arrays (one row per
+question, sorted by id) so that section pools, exclusions and coverage
+scoring run as vectorized masks and reductions. Question text is kept in
+a separate list and only hydrated for the rows that are actually needed.
+"""
+import re
+from datetime import datetime
+
+import numpy as np
+
+# Facet dimensions stored as integer level codes (0 = missing relation)
+FACETS = ('unit', 'co', 'bloom', 'difficulty')
+
+# Columns needed to build a bank (no tags/options/images)
+BANK_COLUMNS = (
+    "id, course_id, question_text, marks, usage_count, last_used_at, status, updated_at, "
+    "units(unit_number), course_outcomes(co_number), bloom_levels(name, level), difficulty_levels(name, level)"
+)
+
+_LEVEL_KEY_PATTERN = re.compile(r'^[A-Za-z_ ]*(\d+)\s*(?:-\s*[A-Za-z_ ]*(\d+))?$')
+
+
+def parse_level_key(key):
+    """Parse target keys such as '3', 'CO2', 'L1-2' or 'Unit 4' into a level range."""
+    match = _LEVEL_KEY_PATTERN.match(str(key).strip())
+    if not match:
+        return None
+    low = int(match.group(1))
+    high = int(match.group(2)) if match.group(2) else low
+    return min(low, high), max(low, high)
+
+
+def to_epoch(value):
+    """Convert a Supabase timestamp string into epoch seconds (0.0 when missing)."""
+    if not value:
+        return 0.0
+    if isinstance(value, datetime):
+        return value.timestamp()
+    try:
+        text = str(value).replace('Z', '+00:00')
+        # Python < 3.11 only accepts 3 or 6 fractional digits
+        if '.' in text:
+            head, _, tail = text.partition('.')
+            digits = ''.join(c for c in tail if c.isdigit())
+            zone = tail[len(digits):]
+            text = f"{head}.{(digits + '000000')[:6]}{zone}"
+        return datetime.fromisoformat(text).timestamp()
+    except ValueError:
+        return 0.0
+
+
+def _as_positions(index):
+    """Normalize a boolean mask or position list into an int64 position array."""
+    index = np.asarray(index)
+    if index.dtype == bool:
+        return np.flatnonzero(index)
+    return index.astype(np.int64, copy=False)
+
+
+class QuestionBank:
+    """Immutable columnar view of a question bank."""
+
+    def __init__(self, ids, marks, facets, usage_count, last_used_at, texts, labels):
+        self.ids = ids
+        self.marks = marks
+        self.facets = facets
+        self.usage_count = usage_count
+        self.last_used_at = last_used_at
+        self.texts = texts
+        self.labels = labels
+
+    # ==================== Construction ====================
+
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        Build a bank from Supabase `questions` rows with embedded
+        units, course_outcomes, bloom_levels and difficulty_levels.
+        """
+        rows = sorted(rows, key=lambda r: r['id'])
+        count = len(rows)
+
+        ids = np.empty(count, dtype=np.int64)
+        marks = np.empty(count, dtype=np.int32)
+        usage = np.empty(count, dtype=np.int32)
+        last_used = np.empty(count, dtype=np.float64)
+        facets = {name: np.zeros(count, dtype=np.int16) for name in FACETS}
+        labels = {name: {} for name in FACETS}
+        texts = []
+
+        for i, q in enumerate(rows):
+            ids[i] = q['id']
+            marks[i] = q['marks']
+            usage[i] = q.get('usage_count') or 0
+            last_used[i] = to_epoch(q.get('last_used_at'))
+            texts.append(q['question_text'])
+
+            unit = q.get('units') or {}
+            co = q.get('course_outcomes') or {}
+            bloom = q.get('bloom_levels') or {}
+            difficulty = q.get('difficulty_levels') or {}
+
+            if unit.get('unit_number') is not None:
+                facets['unit'][i] = unit['unit_number']
+                labels['unit'][unit['unit_number']] = str(unit['unit_number'])
+            if co.get('co_number') is not None:
+                facets['co'][i] = co['co_number']
+                labels['co'][co['co_number']] = f"CO{co['co_number']}"
+            if bloom.get('level') is not None:
+                facets['bloom'][i] = bloom['level']
+                labels['bloom'][bloom['level']] = bloom.get('name', '')
+            if difficulty.get('level') is not None:
+                facets['difficulty'][i] = difficulty['level']
+                labels['difficulty'][difficulty['level']] = difficulty.get('name', '')
+
+        return cls(ids, marks, facets, usage, last_used, texts, labels)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def take(self, index):
+        """Return a new bank restricted to a boolean mask or array of row positions."""
+        index = _as_positions(index)
+        return QuestionBank(
+            self.ids[index],
+            self.marks[index],
+            {name: codes[index] for name, codes in self.facets.items()},
+            self.usage_count[index],
+            self.last_used_at[index],
+            [self.texts[i] for i in index],
+            self.labels
+        )
+
+    def upsert(self, rows, removed_ids=()):
+        """
+        Return a new bank with `rows` added or replacing rows of the same id,
+        and `removed_ids` dropped. Used for incremental snapshot refreshes.
+        """
+        changed = QuestionBank.from_rows(rows)
+        dropped = [int(i) for i in removed_ids] + changed.ids.tolist()
+        kept = self.take(self.exclusion_mask(dropped))
+
+        labels = {name: {**kept.labels[name], **changed.labels[name]} for name in FACETS}
+        merged = QuestionBank(
+            np.concatenate([kept.ids, changed.ids]),
+            np.concatenate([kept.marks, changed.marks]),
+            {name: np.concatenate([kept.facets[name], changed.facets[name]]) for name in FACETS},
+            np.concatenate([kept.usage_count, changed.usage_count]),
+            np.concatenate([kept.last_used_at, changed.last_used_at]),
+            kept.texts + changed.texts,
+            labels
+        )
+        return merged.take(np.argsort(merged.ids, kind='stable'))
+
+    def with_usage(self, question_ids, used_at):
+        """
+        Return a new bank with usage_count incremented once per occurrence
+        of each id in question_ids and last_used_at set to `used_at` (epoch
+        seconds). Ids not in the bank are ignored.
+        """
+        positions = self.positions_of(question_ids)
+        usage_count = self.usage_count.copy()
+        last_used_at = self.last_used_at.copy()
+        np.add.at(usage_count, positions, 1)
+        last_used_at[positions] = used_at
+        return QuestionBank(
+            self.ids, self.marks, self.facets, usage_count, last_used_at, self.texts, self.labels
+        )
+
+    # ==================== Masks ====================
+
+    def positions_of(self, question_ids):
+        """Row positions for the given question ids (ids not in the bank are dropped)."""
+        wanted = np.asarray([int(q) for q in question_ids], dtype=np.int64)
+        if not len(wanted) or not len(self.ids):
+            return np.empty(0, dtype=np.int64)
+        pos = np.searchsorted(self.ids, wanted)
+        pos = np.clip(pos, 0, len(self.ids) - 1)
+        return pos[self.ids[pos] == wanted]
+
+    def exclusion_mask(self, question_ids):
+        """Boolean mask of rows whose id is NOT in question_ids."""
+        mask = np.ones(len(self.ids), dtype=bool)
+        if question_ids:
+            mask[self.positions_of(question_ids)] = False
+        return mask
+
+    def marks_mask(self, marks_values):
+        """Boolean mask of rows whose marks are one of marks_values."""
+        return np.isin(self.marks, np.asarray(list(marks_values), dtype=np.int32))
+
+    def facet_levels(self, facet, key):
+        """Level codes of a facet that a target key (name, number or 'a-b' range) refers to."""
+        key_text = str(key).strip().lower()
+        levels = {lvl for lvl, name in self.labels[facet].items() if str(name).strip().lower() == key_text}
+        key_range = parse_level_key(key)
+        if key_range:
+            levels.update(range(key_range[0], key_range[1] + 1))
+        return np.asarray(sorted(levels), dtype=np.int16)
+
+    def facet_counts(self):
+        """
+        Question counts per marks value and per (marks, level) of every facet:
+        {'marks': {marks: n}, facet: {(marks, level): n}}.
+        """
+        values, sizes = np.unique(self.marks, return_counts=True)
+        counts = {'marks': dict(zip(values.tolist(), sizes.tolist()))}
+        for facet, levels in self.facets.items():
+            keys = self.marks.astype(np.int64) * 65536 + levels.astype(np.int64)
+            values, sizes = np.unique(keys, return_counts=True)
+            counts[facet] = {
+                (int(key // 65536), int(key % 65536)): int(size)
+                for key, size in zip(values.tolist(), sizes.tolist())
+            }
+        return counts
+
+    # ==================== Hydration ====================
+
+    def entries(self, index=None, include_text=True):
+        """Materialize flat dict entries (for prompts and persistence) for the given rows."""
+        index = np.arange(len(self.ids)) if index is None else _as_positions(index)
+
+        labels = self.labels
+        result = []
+        for i in index.tolist():
+            unit = int(self.facets['unit'][i])
+            co = int(self.facets['co'][i])
+            bloom = int(self.facets['bloom'][i])
+            difficulty = int(self.facets['difficulty'][i])
+            entry = {
+                "qid": int(self.ids[i]),
+                "marks": int(self.marks[i]),
+                "unit": unit,
+                "co": labels['co'].get(co, ""),
+                "bloom": labels['bloom'].get(bloom, ""),
+                "difficulty": labels['difficulty'].get(difficulty, ""),
+                "co_number": co or None,
+                "bloom_level": bloom or None,
+                "difficulty_level": difficulty or None,
+                "usage_count": int(self.usage_count[i]),
+            }
+            if include_text:
+                entry["question_text"] = self.texts[i]
+            result.append(entry)
+        return result
+
+    def to_prompt_table(self, include_text=True):
+        """
+        Encode the bank as a dictionary-encoded, pipe-separated table for LLM prompts.
+
+        CO, Bloom and difficulty labels are replaced by short integer codes
+        declared once in a legend, so each row carries no repeated keys.
+        With include_text=False rows carry attributes only.
+        """
+        lines = []
+        codes = {}
+        for facet, title in (('co', 'CO'), ('bloom', 'BLOOM'), ('difficulty', 'DIFFICULTY')):
+            levels = np.unique(self.facets[facet])
+            codes[facet] = np.searchsorted(levels, self.facets[facet])
+            legend = ', '.join(
+                f"{code}={self.labels[facet].get(int(level), '-') or '-'}"
+                for code, level in enumerate(levels.tolist())
+            )
+            lines.append(f"{title}: {legend}")
+
+        columns = 'q|m|u|c|b|d|t' if include_text else 'q|m|u|c|b|d'
+        lines.append(f"ROWS ({columns}):")
+        table = np.column_stack([
+            self.ids, self.marks, self.facets['unit'],
+            codes['co'], codes['bloom'], codes['difficulty']
+        ]).tolist()
+        for i, row in enumerate(table):
+            line = '|'.join(map(str, row))
+            if include_text:
+                text = ' '.join(str(self.texts[i]).replace('|', '/').split())
+                line = f"{line}|{text}"
+            lines.append(line)
+        return '\n'.join(lines)
@@ -0,0 +1,211 @@
+"""
+Per-course question bank snapshot cache for Academic ERP Backend.
+
+Keeps the columnar QuestionBank of each course in process memory together
+with a version stamp. Fresh snapshots are served without touching the
+database; stale ones are refreshed incrementally from a watermark over
+`updated_at` (content edits) and `last_used_at` (usage bookkeeping, which
+does not touch updated_at) instead of re-downloading the whole bank, so
+usage tie-breaks follow papers saved by other workers too. The version
+stamp follows content only (row count and the updated_at watermark):
+usage bookkeeping never changes it.
+Question writes mark the affected course stale so the next generation
+picks up the change; papers saved by this process patch their usage into
+the cached bank (record_usage) without a refresh.
+
+Snapshots are per worker process: writes handled by another worker are
+picked up once the snapshot TTL expires.
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+
+from flask import current_app
+
+from services.question_bank import QuestionBank, BANK_COLUMNS, to_epoch
+from utils.chunked_fetch import fetch_all_rows
+from utils.supabase_client import get_supabase_client
+
+logger = logging.getLogger(__name__)
+
+# Re-read rows this many seconds before the watermark to catch transactions
+# that committed after a refresh with an earlier updated_at.
+WATERMARK_OVERLAP_SECONDS = 5.0
+
+_snapshots = {}
+_course_locks = {}
+_registry_lock = threading.Lock()
+
+
+class BankSnapshot:
+    """
+    Cached bank of one course with its version stamp and watermarks:
+    `watermark` (updated_at or last_used_at) drives delta fetches,
+    `content_watermark` (updated_at only) the version.
+    """
+
+    def __init__(self, course_id, bank, watermark, content_watermark, checked_at):
+        self.course_id = course_id
+        self.bank = bank
+        self.watermark = watermark
+        self.content_watermark = content_watermark
+        self.checked_at = checked_at
+        self.version = f"{len(bank)}-{int(content_watermark * 1e6)}"
+        self._facet_counts = None
+
+    @property
+    def facet_counts(self):
+        """Per-course facet counts (QuestionBank.facet_counts), computed once per snapshot."""
+        if self._facet_counts is None:
+            self._facet_counts = self.bank.facet_counts()
+        return self._facet_counts
+
+    def is_fresh(self, ttl):
+        return time.monotonic() - self.checked_at < ttl
+
+
+class QuestionBankCache:
+    """Service class for cached per-course question bank snapshots."""
+
+    @staticmethod
+    def _course_lock(course_id):
+        with _registry_lock:
+            return _course_locks.setdefault(course_id, threading.Lock())
+
+    @staticmethod
+    def get_snapshot(course_id):
+        """
+        Get the bank snapshot of a course.
+        Serves fresh snapshots from memory, refreshes stale ones incrementally
+        and performs a full load on first use.
+        """
+        ttl = current_app.config.get('PAPER_BANK_CACHE_TTL', 30)
+
+        snapshot = _snapshots.get(course_id)
+        if snapshot and snapshot.is_fresh(ttl):
+            return snapshot
+
+        with QuestionBankCache._course_lock(course_id):
+            # Another thread may have refreshed while we waited
+            snapshot = _snapshots.get(course_id)
+            if snapshot and snapshot.is_fresh(ttl):
+                return snapshot
+
+            if snapshot is None:
+                snapshot = QuestionBankCache._load(course_id)
+            else:
+                snapshot = QuestionBankCache._refresh(snapshot)
+            _snapshots[course_id] = snapshot
+            return snapshot
+
+    @staticmethod
+    def invalidate(course_id=None):
+        """Mark a course snapshot (or all snapshots) stale after question writes."""
+        targets = list(_snapshots.values()) if course_id is None else [_snapshots.get(course_id)]
+        for snapshot in targets:
+            if snapshot is not None:
+                snapshot.checked_at = float('-inf')
+
+    @staticmethod
+    def record_usage(course_id, question_ids):
+        """
+        Apply the usage bookkeeping of a paper saved by this process to the
+        cached bank of its course (what record_question_usage did in the
+        database), keeping the snapshot fresh and its version unchanged.
+        """
+        with QuestionBankCache._course_lock(course_id):
+            snapshot = _snapshots.get(course_id)
+            if snapshot is None:
+                return
+            patched = BankSnapshot(
+                course_id,
+                snapshot.bank.with_usage(question_ids, time.time()),
+                snapshot.watermark,
+                snapshot.content_watermark,
+                snapshot.checked_at
+            )
+            # Usage never changes facet counts
+            patched._facet_counts = snapshot._facet_counts
+            _snapshots[course_id] = patched
+
+    @staticmethod
+    def clear():
+        """Drop every snapshot."""
+        _snapshots.clear()
+
+    @staticmethod
+    def _fetch_rows(course_id, since=None):
+        """Fetch bank rows of a course, optionally only those edited or used at or after `since`."""
+        def apply_filters(query):
+            query = query.eq('course_id', course_id)
+            if since is None:
+                return query.eq('status', 'active')
+            return query.or_(f"updated_at.gte.{since},last_used_at.gte.{since}")
+
+        rows, _ = fetch_all_rows(
+            'questions', BANK_COLUMNS, apply_filters,
+            chunk_size=current_app.config.get('BANK_FETCH_CHUNK_SIZE', 1000),
+            max_workers=current_app.config.get('BANK_FETCH_WORKERS', 4)
+        )
+        return rows
+
+    @staticmethod
+    def _active_count(course_id):
+        supabase = get_supabase_client()
+        response = supabase.table('questions').select('id', count='exact') \
+            .eq('course_id', course_id).eq('status', 'active').limit(1).execute()
+        return response.count or 0
+
+    @staticmethod
+    def _watermark(rows, current=0.0, columns=('updated_at', 'last_used_at')):
+        return max([current] + [to_epoch(r.get(column)) for r in rows for column in columns])
+
+    @staticmethod
+    def _load(course_id):
+        """Full load of a course bank."""
+        started = time.perf_counter()
+        rows = QuestionBankCache._fetch_rows(course_id)
+        snapshot = BankSnapshot(
+            course_id,
+            QuestionBank.from_rows(rows),
+            QuestionBankCache._watermark(rows),
+            QuestionBankCache._watermark(rows, columns=('updated_at',)),
+            time.monotonic()
+        )
+        logger.info(
+            f"Loaded question bank snapshot for course {course_id}: "
+            f"{len(rows)} questions in {time.perf_counter() - started:.3f}s"
+        )
+        return snapshot
+
+    @staticmethod
+    def _refresh(snapshot):
+        """Apply rows changed since the watermark; fall back to a full load on drift."""
+        course_id = snapshot.course_id
+        since = datetime.fromtimestamp(
+            max(0.0, snapshot.watermark - WATERMARK_OVERLAP_SECONDS), tz=timezone.utc
+        ).isoformat()
+        changed = QuestionBankCache._fetch_rows(course_id, since=since)
+
+        bank = snapshot.bank
+        if changed:
+            active = [r for r in changed if r.get('status') == 'active']
+            inactive = [r['id'] for r in changed if r.get('status') != 'active']
+            bank = bank.upsert(active, removed_ids=inactive)
+
+        # Deleted rows leave no watermark trace; detect them by count drift
+        if len(bank) != QuestionBankCache._active_count(course_id):
+            logger.info(f"Question bank drift detected for course {course_id}, reloading snapshot")
+            return QuestionBankCache._load(course_id)
+
+        refreshed = BankSnapshot(
+            course_id, bank,
+            QuestionBankCache._watermark(changed, snapshot.watermark),
+            QuestionBankCache._watermark(changed, snapshot.content_watermark, columns=('updated_at',)),
+            time.monotonic()
+        )
+        logger.debug(
+            f"Refreshed question bank snapshot for course {course_id}: {len(changed)} changed rows"
+        )
+        return refreshed
@@ -0,0 +1,102 @@
+"""
+Recency-aware question rotation for Academic ERP Backend.
+
+Questions used by the last N papers of a course are looked up server-side
+in one query (recently_used_questions RPC) and turned into a bitmap over
+the course's QuestionBank. Depending on the policy they are excluded from
+the pool ('exclude') or only ranked behind fresher questions of the same
+kind ('downweight'). Explicit `previously_used_ids` from the request are
+always excluded.
+"""
+import hashlib
+import logging
+
+import numpy as np
+from flask import current_app
+
+from utils.supabase_client import get_supabase_client
+
+logger = logging.getLogger(__name__)
+
+ROTATION_POLICIES = ('exclude', 'downweight', 'off')
+
+
+class RotationPlan:
+    """Exclusion bitmap and recency penalties aligned with a bank's rows."""
+
+    def __init__(self, excluded, recency, info):
+        self.excluded = excluded
+        self.recency = recency
+        self.info = info
+
+    def eligible(self, bank):
+        """Bank restricted to non-excluded rows, with the matching recency penalties."""
+        keep = ~self.excluded
+        return bank.take(keep), self.recency[keep]
+
+    def fingerprint(self, bank):
+        """Hash of the excluded ids and recency penalties, for keying cached results."""
+        digest = hashlib.sha256(str(self.info.get('policy')).encode('utf-8'))
+        digest.update(np.sort(bank.ids[self.excluded]).astype(np.int64).tobytes())
+        recent = np.flatnonzero(self.recency)
+        order = np.argsort(bank.ids[recent], kind='stable')
+        digest.update(bank.ids[recent][order].astype(np.int64).tobytes())
+        digest.update(self.recency[recent][order].astype(np.float64).tobytes())
+        return digest.hexdigest()
+
+    def relaxed(self, bank):
+        """Fallback when exclusion leaves too few questions: keep every row, down-weight recent ones."""
+        self.info = {**self.info, 'policy': 'downweight', 'relaxed': True}
+        logger.warning("Rotation exclusions leave too few questions; down-weighting instead")
+        return bank, self.recency
+
+
+class QuestionRotation:
+    """Service class for server-side question rotation."""
+
+    @staticmethod
+    def recent_usage(course_id, window):
+        """Map of question id -> papers ago, for questions used by the last `window` papers."""
+        supabase = get_supabase_client()
+        try:
+            response = supabase.rpc('recently_used_questions', {
+                'p_course_id': course_id,
+                'p_paper_window': window
+            }).execute()
+        except Exception as e:
+            logger.warning(f"Recent question usage lookup failed for course {course_id}: {str(e)}")
+            return {}
+        return {row['question_id']: row['papers_ago'] for row in response.data or []}
+
+    @staticmethod
+    def plan(course_id, bank, data):
+        """
+        Build the rotation plan for a generation request.
+
+        Recency penalties are window - papers_ago + 1 for recently used
+        questions (higher = used more recently) and 0 otherwise.
+        """
+        policy = data.get('rotation_policy') or current_app.config.get('PAPER_ROTATION_POLICY', 'exclude')
+        window = data.get('rotation_window')
+        window = int(current_app.config.get('PAPER_ROTATION_WINDOW', 5) if window is None else window)
+
+        recency = np.zeros(len(bank), dtype=np.float64)
+        excluded = ~bank.exclusion_mask(data.get('previously_used_ids', []))
+
+        recent = {}
+        if policy != 'off' and window > 0:
+            recent = QuestionRotation.recent_usage(course_id, window)
+        if recent:
+            positions = bank.positions_of(list(recent.keys()))
+            papers_ago = np.asarray([recent[q] for q in bank.ids[positions].tolist()], dtype=np.float64)
+            recency[positions] = window - papers_ago + 1
+            if policy == 'exclude':
+                excluded[positions] = True
+
+        info = {
+            'policy': policy,
+            'window': window,
+            'recent_questions': len(recent),
+            'excluded': int(excluded.sum())
+        }
+        return RotationPlan(excluded, recency, info)
@@ -2,6 +2,7 @@
 Question service for Academic ERP Backend.
 Handles business logic for question bank management.
 """
+from services.question_bank_cache import QuestionBankCache
 from utils.supabase_client import get_supabase_client
 
 
@@ -11,8 +12,14 @@ class QuestionService:
     @staticmethod
     def get_questions(page=1, per_page=20, course_id=None, unit_id=None, 
                       co_id=None, bloom_level_id=None, difficulty_id=None, 
-                      search_query=None, status='active'):
-        """Get paginated and filtered questions."""
+                      search_query=None, status='active', tags_any=None, tags_all=None):
+        """
+        Get paginated and filtered questions.
+        
+        tags_any matches questions carrying at least one of the given tags (&&),
+        tags_all matches questions carrying every given tag (@>). Both are
+        served by the GIN index on questions.tags.
+        """
         supabase = get_supabase_client()
         query = supabase.table('questions').select(
             "*, course_outcomes(description, co_number), bloom_levels(name), difficulty_levels(name), units(name, unit_number), courses(name, code)",
@@ -31,6 +38,10 @@ class QuestionService:
             query = query.eq('bloom_level_id', bloom_level_id)
         if difficulty_id:
             query = query.eq('difficulty_id', difficulty_id)
+        if tags_any:
+            query = query.overlaps('tags', list(tags_any))
+        if tags_all:
+            query = query.contains('tags', list(tags_all))
             
         if search_query:
             query = query.ilike('question_text', f"%{search_query}%")
@@ -65,6 +76,25 @@ class QuestionService:
             'per_page': per_page
         }
     
+    @staticmethod
+    def normalize_tags(tags):
+        """
+        Normalize tags into a clean list for the TEXT[] column.
+        Accepts a list or a legacy comma-separated string; trims whitespace
+        and drops empty and duplicate entries while keeping order.
+        """
+        if not tags:
+            return []
+        if isinstance(tags, str):
+            tags = tags.split(',')
+        
+        normalized = []
+        for tag in tags:
+            tag = str(tag).strip()
+            if tag and tag not in normalized:
+                normalized.append(tag)
+        return normalized
+    
     @staticmethod
     def get_question(question_id):
         """Get a single question by ID."""
@@ -95,6 +125,30 @@ class QuestionService:
             
         return None
     
+    @staticmethod
+    def get_question_usage(question_ids):
+        """
+        Papers each question appeared in, for impact checks before edits.
+
+        One question_usage RPC call (011) returns a row per question with
+        its papers aggregated, so the lookup is a single round trip whatever
+        the number of ids and is not truncated by PostgREST's max-rows.
+
+        Returns:
+            List of {question_id, paper_count, papers: [{paper_id, title,
+            exam_type, status, created_at, section, question_number}]},
+            newest paper first, in the order of question_ids
+        """
+        question_ids = list(dict.fromkeys(int(i) for i in question_ids))
+        supabase = get_supabase_client()
+        response = supabase.rpc('question_usage', {'p_question_ids': question_ids}).execute()
+
+        usage = {row['question_id']: row for row in response.data or []}
+        return [
+            usage.get(qid) or {'question_id': qid, 'paper_count': 0, 'papers': []}
+            for qid in question_ids
+        ]
+    
     @staticmethod
     def create_question(data, faculty_id):
         """Create a new question."""
@@ -113,10 +167,11 @@ class QuestionService:
             'options': data.get('options'),
             'correct_answer': data.get('correct_answer'),
             'image_url': data.get('image_url'),
-            'tags': ','.join(data.get('tags', [])),
+            'tags': QuestionService.normalize_tags(data.get('tags')),
             'status': data.get('status', 'active')
         }
         response = supabase.table('questions').insert(payload).execute()
+        QuestionBankCache.invalidate(data['course_id'])
         return response.data[0] if response.data else None
     
     @staticmethod
@@ -134,12 +189,18 @@ class QuestionService:
                 payload[field] = data[field]
         
         if 'tags' in data:
-            payload['tags'] = ','.join(data['tags'])
+            payload['tags'] = QuestionService.normalize_tags(data['tags'])
             
         if not payload:
             return None
             
         response = supabase.table('questions').update(payload).eq('id', question_id).execute()
+        
+        # A course change affects the snapshot of the previous course as well
+        if 'course_id' in payload:
+            QuestionBankCache.invalidate()
+        elif response.data:
+            QuestionBankCache.invalidate(response.data[0]['course_id'])
         return response.data[0] if response.data else None
     
     @staticmethod
@@ -147,6 +208,8 @@ class QuestionService:
         """Delete a question."""
         supabase = get_supabase_client()
         response = supabase.table('questions').delete().eq('id', question_id).execute()
+        for row in response.data:
+            QuestionBankCache.invalidate(row['course_id'])
         return len(response.data) > 0
     
     @staticmethod
@@ -170,6 +233,7 @@ class QuestionService:
                 'question_text': q_data['question_text'],
                 'marks': q_data['marks'],
                 'question_type': q_data.get('question_type', 'descriptive'),
+                'tags': QuestionService.normalize_tags(q_data.get('tags')),
                 'status': 'active'
                 # Add default other fields if needed or let DB default handle them
             })
@@ -179,6 +243,8 @@ class QuestionService:
 
         try:
             response = supabase.table('questions').insert(payloads).execute()
+            for course_id in {p['course_id'] for p in payloads}:
+                QuestionBankCache.invalidate(course_id)
             if response.data:
                 return True, [q['id'] for q in response.data]
             return False, ["Upload failed silently"]
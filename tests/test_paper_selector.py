@@ -0,0 +1,202 @@
+"""
+Tests for the deterministic paper selector: section filling, shortfall and
+feasibility reports, coverage deviations and optimality on small banks.
+"""
+import itertools
+import random
+
+import numpy as np
+import pytest
+
+from services.paper_selector import PaperSelector
+from services.question_bank import QuestionBank
+
+
+def make_bank(questions):
+    """Bank from (id, marks, unit, co, bloom level, difficulty level) tuples."""
+    return QuestionBank.from_rows([
+        {
+            'id': qid,
+            'marks': marks,
+            'question_text': f"Question {qid}",
+            'units': {'unit_number': unit},
+            'course_outcomes': {'co_number': co},
+            'bloom_levels': {'name': f"B{bloom}", 'level': bloom},
+            'difficulty_levels': {'name': f"D{difficulty}", 'level': difficulty},
+        }
+        for qid, marks, unit, co, bloom, difficulty in questions
+    ])
+
+
+def total_deviation(report):
+    return sum(c['deviation'] for c in report['coverage'].values())
+
+
+def selected_ids(selection):
+    return [q['qid'] for section in selection['sections'] for q in section['questions']]
+
+
+def random_instance(rng):
+    """4 questions out of 8-12 with unit, Bloom and difficulty targets."""
+    bank = make_bank([
+        (i, 5, rng.randint(1, 4), rng.randint(1, 3), rng.randint(1, 4), rng.randint(1, 3))
+        for i in range(1, rng.randint(8, 12) + 1)
+    ])
+
+    def weights(keys, prefix=''):
+        raw = {f"{prefix}{k}": rng.randint(0, 4) for k in keys}
+        return {k: v for k, v in raw.items() if v} or {f"{prefix}{keys[0]}": 1}
+
+    data = {
+        'sections': [{'name': 'A', 'marks_per_question': 5, 'total_questions': 4}],
+        'unit_coverage': weights([1, 2, 3, 4]),
+        'bloom_distribution': weights([1, 2, 3, 4], 'B'),
+        'difficulty_distribution': weights([1, 2, 3], 'D'),
+        'seed': 1,
+    }
+    return bank, data
+
+
+def brute_force_deviation(bank, data):
+    section = data['sections'][0]
+    pool = np.flatnonzero(bank.marks == section['marks_per_question'])
+    return min(
+        total_deviation(PaperSelector.evaluate(bank, [{
+            'name': section['name'], 'questions': bank.entries(list(picked), include_text=False)
+        }], data))
+        for picked in itertools.combinations(pool.tolist(), section['total_questions'])
+    )
+
+
+def test_fills_every_section_with_its_marks():
+    bank = make_bank([(i, 2 if i <= 10 else 10, 1 + i % 3, 1, 1, 1) for i in range(1, 21)])
+    data = {'sections': [
+        {'name': 'A', 'marks_per_question': 2, 'total_questions': 5},
+        {'name': 'B', 'marks_per_question': 10, 'total_questions': 3},
+    ]}
+
+    selection = PaperSelector.select(bank, data)
+
+    assert selection['report']['feasible']
+    assert [len(s['questions']) for s in selection['sections']] == [5, 3]
+    assert {q['marks'] for q in selection['sections'][0]['questions']} == {2}
+    assert {q['marks'] for q in selection['sections'][1]['questions']} == {10}
+    assert len(set(selected_ids(selection))) == 8
+    assert selection['report']['total_marks']['achieved'] == 40
+
+
+def test_reports_shortfall_when_the_pool_is_too_small():
+    bank = make_bank([(i, 5, 1, 1, 1, 1) for i in range(1, 4)])
+    data = {'sections': [{'name': 'A', 'marks_per_question': 5, 'total_questions': 5}]}
+
+    report = PaperSelector.select(bank, data)['report']
+
+    assert not report['feasible']
+    assert not report['within_tolerance']
+    assert report['sections'][0]['shortfall'] == 2
+
+
+def test_excluded_questions_are_never_selected():
+    bank = make_bank([(i, 5, 1, 1, 1, 1) for i in range(1, 9)])
+    data = {'sections': [{'name': 'A', 'marks_per_question': 5, 'total_questions': 4}]}
+
+    selection = PaperSelector.select(bank, data, exclude_ids=[1, 2, 3, 4])
+
+    assert sorted(selected_ids(selection)) == [5, 6, 7, 8]
+
+
+def test_evaluate_reports_deviation_in_points_of_marks():
+    bank = make_bank([(1, 5, 1, 1, 1, 1), (2, 5, 1, 1, 1, 1), (3, 10, 2, 1, 1, 1)])
+    data = {'unit_coverage': {'1': 50, '2': 50}}
+    sections = [{'name': 'A', 'questions': bank.entries([0, 1, 2], include_text=False)}]
+
+    assert PaperSelector.evaluate(bank, sections, data)['coverage']['unit_coverage']['deviation'] == 0.0
+
+    sections = [{'name': 'A', 'questions': bank.entries([0, 1], include_text=False)}]
+    coverage = PaperSelector.evaluate(bank, sections, data)['coverage']['unit_coverage']
+    assert coverage['deviation'] == 50.0
+    assert coverage['buckets']['1']['achieved'] == 100.0
+    assert coverage['buckets']['2']['deviation'] == -50.0
+
+
+def test_meets_achievable_targets_exactly():
+    bank = make_bank([(i, 5, 1 + i % 4, 1, 1 + i % 2, 1) for i in range(1, 41)])
+    data = {
+        'sections': [{'name': 'A', 'marks_per_question': 5, 'total_questions': 8}],
+        'unit_coverage': {'1': 25, '2': 25, '3': 25, '4': 25},
+        'bloom_distribution': {'B1': 50, 'B2': 50},
+    }
+
+    report = PaperSelector.select(bank, data)['report']
+
+    assert report['within_tolerance']
+    assert total_deviation(report) == 0.0
+
+
+def test_same_seed_selects_the_same_questions():
+    bank = make_bank([(i, 5, 1 + i % 2, 1, 1, 1) for i in range(1, 31)])
+    data = {
+        'sections': [{'name': 'A', 'marks_per_question': 5, 'total_questions': 6}],
+        'unit_coverage': {'1': 50, '2': 50},
+        'seed': 42,
+    }
+
+    assert selected_ids(PaperSelector.select(bank, data)) == selected_ids(PaperSelector.select(bank, data))
+
+
+@pytest.mark.parametrize('instance', range(40))
+def test_matches_the_brute_force_optimum_on_small_banks(instance):
+    bank, data = random_instance(random.Random(instance))
+
+    selection = PaperSelector.select(bank, data)
+
+    assert selection['report']['feasible']
+    # Per-dimension deviations are rounded to 0.01
+    assert total_deviation(selection['report']) <= brute_force_deviation(bank, data) + 0.02
+
+
+@pytest.mark.parametrize('instance', range(40))
+def test_exchange_search_alone_stays_close_to_the_optimum(instance, monkeypatch):
+    monkeypatch.setattr(PaperSelector, 'EXACT_SEARCH_LIMIT', 0)
+    bank, data = random_instance(random.Random(1000 + instance))
+
+    report = PaperSelector.select(bank, data)['report']
+
+    assert report['feasible']
+    assert total_deviation(report) <= brute_force_deviation(bank, data) + 10
+
+
+def test_feasibility_flags_short_sections_and_unreachable_targets():
+    bank = make_bank([(i, 5, 1, 1, 1, 1) for i in range(1, 6)] + [(i, 10, 2, 1, 1, 1) for i in range(6, 8)])
+    counts = bank.facet_counts()
+
+    report = PaperSelector.feasibility(bank, counts, {
+        'sections': [
+            {'name': 'A', 'marks_per_question': 5, 'total_questions': 4},
+            {'name': 'B', 'marks_per_question': 10, 'total_questions': 3},
+        ],
+    })
+    assert not report['feasible']
+    assert [s['shortfall'] for s in report['sections']] == [0, 1]
+
+    # 4 x 5 marks, all unit 1: a 50/50 unit split cannot be met
+    report = PaperSelector.feasibility(bank, counts, {
+        'sections': [{'name': 'A', 'marks_per_question': 5, 'total_questions': 4}],
+        'unit_coverage': {'1': 50, '2': 50},
+    })
+    assert not report['feasible']
+    assert report['coverage']['unit_coverage']['min_deviation'] == 50.0
+
+
+def test_feasibility_agrees_with_select_on_achievable_blueprints():
+    bank = make_bank([(i, 5, 1 + i % 2, 1, 1, 1) for i in range(1, 21)])
+    data = {
+        'sections': [{'name': 'A', 'marks_per_question': 5, 'total_questions': 6}],
+        'unit_coverage': {'1': 50, '2': 50},
+    }
+
+    report = PaperSelector.feasibility(bank, bank.facet_counts(), data)
+
+    assert report['feasible'] and report['within_tolerance']
+    assert report['coverage']['unit_coverage']['min_deviation'] == 0.0
+    assert PaperSelector.select(bank, data)['report']['within_tolerance']
@@ -0,0 +1,128 @@
+"""
+Chunked parallel table fetch for Academic ERP Backend.
+
+PostgREST caps every response at its `max-rows` setting, so a single
+unpaginated select silently truncates large result sets. This loader
+splits the id range of the filtered rows into id-ordered chunks, fetches
+them in parallel on a bounded thread pool and reassembles the full set.
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.supabase_client import get_supabase_client
+
+logger = logging.getLogger(__name__)
+
+# Supabase's default PostgREST max-rows
+DEFAULT_CHUNK_SIZE = 1000
+DEFAULT_MAX_WORKERS = 4
+
+
+def _query(table, columns, apply_filters):
+    supabase = get_supabase_client()
+    query = supabase.table(table).select(columns)
+    return apply_filters(query) if apply_filters else query
+
+
+def _id_bound(table, apply_filters, desc):
+    response = _query(table, 'id', apply_filters).order('id', desc=desc).limit(1).execute()
+    return response.data[0]['id'] if response.data else None
+
+
+def _row_count(table, apply_filters):
+    supabase = get_supabase_client()
+    query = supabase.table(table).select('id', count='exact')
+    query = apply_filters(query) if apply_filters else query
+    return query.limit(1).execute().count or 0
+
+
+def _fetch_range(table, columns, apply_filters, low, high, chunk_size, until_empty=False):
+    """
+    Fetch all rows with low <= id <= high, continuing past the page cap if
+    needed. A page shorter than chunk_size ends the range, unless until_empty
+    is set (the server caps pages below chunk_size) and only an empty page does.
+    """
+    rows = []
+    while low <= high:
+        page = _query(table, columns, apply_filters) \
+            .gte('id', low).lte('id', high).order('id').limit(chunk_size).execute().data or []
+        rows.extend(page)
+        if not page or (len(page) < chunk_size and not until_empty):
+            break
+        low = page[-1]['id'] + 1
+    return rows
+
+
+def fetch_all_rows(table, columns='*', apply_filters=None,
+                   chunk_size=DEFAULT_CHUNK_SIZE, max_workers=DEFAULT_MAX_WORKERS):
+    """
+    Fetch every row of a filtered table in id-ordered chunks.
+
+    Args:
+        table: Table name
+        columns: PostgREST select string (must include `id`)
+        apply_filters: Optional callable adding filters to a query builder
+        chunk_size: Rows per request (keep at or below PostgREST max-rows)
+        max_workers: Size of the fetch thread pool
+
+    Returns:
+        Tuple of (rows ordered by id, stats dict with rows, chunks and seconds)
+    """
+    started = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        low_future = pool.submit(_id_bound, table, apply_filters, False)
+        high_future = pool.submit(_id_bound, table, apply_filters, True)
+        count_future = pool.submit(_row_count, table, apply_filters)
+        low, high, count = low_future.result(), high_future.result(), count_future.result()
+
+        chunks = []
+        if low is not None:
+            # Spread the expected row count evenly over the id span; sparse ids
+            # get wider ranges and dense spots continue past the page cap.
+            span = high - low + 1
+            chunk_count = max(1, -(-count // chunk_size))
+            width = max(chunk_size, -(-span // chunk_count))
+            chunks = [
+                (start, min(start + width - 1, high))
+                for start in range(low, high + 1, width)
+            ]
+        futures = [
+            pool.submit(_fetch_range, table, columns, apply_filters, start, end, chunk_size)
+            for start, end in chunks
+        ]
+        ranges = [future.result() for future in futures]
+
+        if sum(len(part) for part in ranges) < count:
+            # PostgREST max-rows is below chunk_size, so short pages may have
+            # been cut: resume every range until it comes back empty
+            logger.warning(
+                f"Fetched fewer than the {count} counted rows from {table}; "
+                f"chunk_size {chunk_size} exceeds the server page cap, paging until empty"
+            )
+            futures = [
+                pool.submit(
+                    _fetch_range, table, columns, apply_filters,
+                    part[-1]['id'] + 1 if part else start, end, chunk_size, True
+                )
+                for (start, end), part in zip(chunks, ranges)
+            ]
+            ranges = [part + future.result() for part, future in zip(ranges, futures)]
+
+        rows = [row for part in ranges for row in part]
+
+    if len(rows) < count:
+        # Rows deleted between the count and the fetch also end up here
+        logger.warning(f"Fetched {len(rows)} of {count} counted rows from {table}")
+
+    stats = {
+        'rows': len(rows),
+        'chunks': len(chunks),
+        'seconds': round(time.perf_counter() - started, 4)
+    }
+    logger.info(
+        f"Fetched {stats['rows']} rows from {table} in {stats['chunks']} chunks "
+        f"({stats['seconds']}s)"
+    )
+    return rows, stats
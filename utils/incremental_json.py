@@ -0,0 +1,130 @@
+"""
+Incremental JSON parsing for streamed model output.
+
+Gemini streams a paper as arbitrary text chunks. SectionStreamParser scans
+the text as it arrives, tracking string and nesting state, and emits each
+element of the paper's "sections" array as soon as its closing brace is
+received, without waiting for (or requiring) the rest of the document.
+Items are parsed with the same tolerance as complete responses.
+
+parse_model_json applies the same salvage to a complete response that
+fails strict parsing (code fences, stray prose, trailing commas or a
+truncated tail).
+"""
+import json
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+_FENCE_PATTERN = re.compile(r'```(?:json)?', re.IGNORECASE)
+_TRAILING_COMMA_PATTERN = re.compile(r',\s*([}\]])')
+
+
+def _loads_tolerant(raw):
+    """json.loads, retried without trailing commas; raises ValueError if both fail."""
+    try:
+        return json.loads(raw)
+    except ValueError:
+        return json.loads(_TRAILING_COMMA_PATTERN.sub(r'\1', raw))
+
+
+class SectionStreamParser:
+    """Emit completed objects of a named JSON array from a chunked text stream."""
+
+    def __init__(self, array_key='sections'):
+        self.text = ''
+        self._key = f'"{array_key}"'
+        self._pos = 0
+        self._array_start = None
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._item_start = None
+        self._done = False
+
+    def _find_array(self):
+        """Locate the '[' that opens the target array; True once found."""
+        key_at = self.text.find(self._key)
+        if key_at < 0:
+            return False
+        bracket = self.text.find('[', key_at + len(self._key))
+        if bracket < 0:
+            return False
+        self._array_start = bracket
+        self._pos = bracket + 1
+        return True
+
+    def feed(self, chunk):
+        """
+        Add a chunk of streamed text.
+
+        Returns:
+            List of array items (dicts) completed by this chunk
+        """
+        self.text += chunk
+        if self._done or (self._array_start is None and not self._find_array()):
+            return []
+
+        items = []
+        text = self.text
+        for pos in range(self._pos, len(text)):
+            char = text[pos]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char in '{[':
+                if self._depth == 0 and char == '{':
+                    self._item_start = pos
+                self._depth += 1
+            elif char in '}]':
+                if self._depth == 0:
+                    # Closing bracket of the array itself
+                    self._done = True
+                    break
+                self._depth -= 1
+                if self._depth == 0 and self._item_start is not None:
+                    raw = text[self._item_start:pos + 1]
+                    self._item_start = None
+                    try:
+                        items.append(_loads_tolerant(raw))
+                    except ValueError as e:
+                        logger.warning(f"Skipping malformed streamed item: {e}")
+        self._pos = len(text)
+        return items
+
+
+def parse_model_json(text, array_key='sections'):
+    """
+    Parse a model's JSON paper, tolerating minor defects.
+
+    Tries strict parsing of the outermost object, then again without
+    trailing commas, and finally salvages the completed items of the
+    `array_key` array into {"paper": {array_key: [...]}}.
+
+    Raises:
+        ValueError: Nothing usable could be recovered
+    """
+    clean = _FENCE_PATTERN.sub('', text or '').strip()
+    start, end = clean.find('{'), clean.rfind('}')
+    candidate = clean[start:end + 1] if start >= 0 and end > start else clean
+
+    try:
+        return _loads_tolerant(candidate)
+    except ValueError:
+        pass
+
+    parser = SectionStreamParser(array_key)
+    items = [item for item in parser.feed(clean) if isinstance(item, dict)]
+    if not items:
+        raise ValueError("No complete sections in model output")
+    logger.warning(f"Recovered {len(items)} {array_key} from malformed model output")
+    return {'paper': {array_key: items}}
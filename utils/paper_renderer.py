@@ -0,0 +1,161 @@
+"""
+Printable paper rendering (PDF and DOCX).
+
+Renders a paper document (see PaperExportService.build_document) with a
+header block, general instructions and one table per section with
+question number, question, marks, CO and Bloom level (BL) columns.
+
+The functions here are pure and picklable so they can run on a process
+pool; each writes the rendered file to a temporary path and atomically
+moves it into place.
+"""
+import os
+import tempfile
+from xml.sax.saxutils import escape
+
+# Bump when the layout changes so cached renders are not reused
+RENDERER_VERSION = 2
+
+FORMATS = {
+    'pdf': 'application/pdf',
+    'docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+}
+
+TABLE_HEADER = ('Q.No', 'Question', 'Marks', 'CO', 'BL')
+
+
+def _header_lines(document):
+    """Title line followed by the detail lines of the paper header."""
+    details = [
+        ' | '.join(part for part in (document.get('course'), document.get('exam_type')) if part),
+        f"Max. Marks: {document['total_marks']}" + (
+            f"    Duration: {document['duration_minutes']} minutes" if document.get('duration_minutes') else ''
+        ),
+    ]
+    return document['title'], [line for line in details if line]
+
+
+def _question_text(question):
+    """Question text followed by its options, one per line."""
+    lines = [question['text']]
+    for label, option in question.get('options', []):
+        lines.append(f"({label}) {option}")
+    return lines
+
+
+def _section_title(section):
+    return f"{section['name']} ({section['marks']} Marks)"
+
+
+def _render_pdf(document, path):
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.units import mm
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+    styles = getSampleStyleSheet()
+    body = styles['BodyText']
+    title, details = _header_lines(document)
+
+    story = [Paragraph(escape(title), styles['Title'])]
+    story += [Paragraph(escape(line), styles['Normal']) for line in details]
+    if document['instructions']:
+        story += [Spacer(1, 4 * mm), Paragraph('<b>Instructions</b>', body)]
+        story += [Paragraph(f"{i}. {escape(line)}", body) for i, line in enumerate(document['instructions'], 1)]
+
+    width = A4[0] - 30 * mm
+    col_widths = [14 * mm, width - 50 * mm, 14 * mm, 11 * mm, 11 * mm]
+    for section in document['sections']:
+        story += [Spacer(1, 6 * mm), Paragraph(escape(_section_title(section)), styles['Heading2'])]
+        if section.get('instructions'):
+            story.append(Paragraph(f"<i>{escape(section['instructions'])}</i>", body))
+
+        rows = [list(TABLE_HEADER)]
+        for question in section['questions']:
+            rows.append([
+                str(question['number']),
+                Paragraph('<br/>'.join(escape(line) for line in _question_text(question)), body),
+                str(question['marks']),
+                question['co'],
+                question['bl'],
+            ])
+        table = Table(rows, colWidths=col_widths, repeatRows=1)
+        table.setStyle(TableStyle([
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+            ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('ALIGN', (2, 0), (-1, -1), 'CENTER'),
+        ]))
+        story.append(table)
+
+    SimpleDocTemplate(
+        path, pagesize=A4, title=title,
+        leftMargin=15 * mm, rightMargin=15 * mm, topMargin=15 * mm, bottomMargin=15 * mm
+    ).build(story)
+
+
+def _render_docx(document, path):
+    from docx import Document
+    from docx.enum.text import WD_ALIGN_PARAGRAPH
+    from docx.shared import Pt
+
+    doc = Document()
+    title, details = _header_lines(document)
+    heading = doc.add_heading(title, level=0)
+    heading.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    for line in details:
+        doc.add_paragraph(line).alignment = WD_ALIGN_PARAGRAPH.CENTER
+
+    if document['instructions']:
+        doc.add_paragraph().add_run('Instructions').bold = True
+        for line in document['instructions']:
+            doc.add_paragraph(line, style='List Number')
+
+    for section in document['sections']:
+        doc.add_heading(_section_title(section), level=2)
+        if section.get('instructions'):
+            doc.add_paragraph().add_run(section['instructions']).italic = True
+
+        table = doc.add_table(rows=1, cols=len(TABLE_HEADER))
+        table.style = 'Table Grid'
+        for cell, label in zip(table.rows[0].cells, TABLE_HEADER):
+            cell.text = ''
+            cell.paragraphs[0].add_run(label).bold = True
+        for question in section['questions']:
+            cells = table.add_row().cells
+            cells[0].text = str(question['number'])
+            cells[1].text = '\n'.join(_question_text(question))
+            cells[2].text = str(question['marks'])
+            cells[3].text = question['co']
+            cells[4].text = question['bl']
+        for row in table.rows:
+            for cell in row.cells:
+                for paragraph in cell.paragraphs:
+                    for run in paragraph.runs:
+                        run.font.size = Pt(10)
+
+    doc.save(path)
+
+
+_RENDERERS = {'pdf': _render_pdf, 'docx': _render_docx}
+
+
+def render_to_file(fmt, document, path):
+    """
+    Render a paper document as `fmt` ('pdf' or 'docx') to `path`.
+    The file appears atomically; returns its size in bytes.
+    """
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    os.close(fd)
+    try:
+        _RENDERERS[fmt](document, tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return os.path.getsize(path)
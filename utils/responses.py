@@ -1,6 +1,8 @@
 """
 Standardized API response formatters for Academic ERP Backend.
 """
+import json
+
 from flask import jsonify
 
 
@@ -129,3 +131,8 @@ def unauthorized_response(message='Authentication required'):
 def forbidden_response(message='Access denied'):
     """Create response for forbidden access."""
     return error_response(message, error_type='Forbidden', status_code=403)
+
+
+def sse_event(event, data):
+    """Format one Server-Sent Events message with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
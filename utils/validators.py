@@ -194,6 +194,12 @@ def validate_question_data(data: dict) -> Tuple[bool, List[str]]:
         if not data.get('correct_answer'):
             errors.append('MCQ questions require correct_answer')
     
+    # Validate tags
+    if data.get('tags') is not None:
+        tags = data['tags']
+        if not isinstance(tags, list) or not all(isinstance(t, str) for t in tags):
+            errors.append('tags must be an array of strings')
+    
     return len(errors) == 0, errors
 
 
@@ -216,12 +222,57 @@ def validate_paper_generation_params(data: dict) -> Tuple[bool, List[str]]:
     if 'total_marks' in data and not validate_positive_int(data['total_marks']):
         errors.append('total_marks must be a positive integer')
     
+    # Blueprint: distributions and sections
+    errors.extend(_blueprint_errors(data))
+    
+    # Generation engine (optional)
+    engines = ['auto', 'ai', 'deterministic', 'hedged']
+    if data.get('engine') is not None and not validate_in_list(data['engine'], engines):
+        errors.append(f'engine must be one of: {", ".join(engines)}')
+    
+    prompt_modes = ['full', 'compact', 'attributes']
+    if data.get('prompt_mode') is not None and not validate_in_list(data['prompt_mode'], prompt_modes):
+        errors.append(f'prompt_mode must be one of: {", ".join(prompt_modes)}')
+    
+    rotation_policies = ['exclude', 'downweight', 'off']
+    if data.get('rotation_policy') is not None and not validate_in_list(data['rotation_policy'], rotation_policies):
+        errors.append(f'rotation_policy must be one of: {", ".join(rotation_policies)}')
+    if data.get('rotation_window') is not None and not validate_positive_int(data['rotation_window'], allow_zero=True):
+        errors.append('rotation_window must be a non-negative integer')
+    
+    # Tie-break seed (optional): a non-negative integer or a string to hash
+    seed = data.get('seed')
+    if seed is not None and not (
+        isinstance(seed, str) or (isinstance(seed, int) and not isinstance(seed, bool) and seed >= 0)
+    ):
+        errors.append('seed must be a non-negative integer or a string')
+    
+    # Multi-set generation (optional)
+    if 'set_count' in data and not validate_positive_int(data['set_count']):
+        errors.append('set_count must be a positive integer')
+    if 'max_overlap' in data and not validate_positive_int(data['max_overlap'], allow_zero=True):
+        errors.append('max_overlap must be a non-negative integer')
+    
+    return len(errors) == 0, errors
+
+
+def _blueprint_errors(data: dict) -> List[str]:
+    """Errors in the coverage distributions and sections of a blueprint."""
+    errors = []
+    
     # Distribution mappings (if provided)
     distributions = ['co_coverage', 'bloom_distribution', 'difficulty_distribution', 'unit_coverage']
     for dist in distributions:
         if dist in data and not isinstance(data[dist], dict):
             errors.append(f'{dist} must be a valid JSON object/dictionary')
     
+    # Questions to leave out (optional)
+    used_ids = data.get('previously_used_ids')
+    if used_ids is not None and not (
+        isinstance(used_ids, list) and all(validate_positive_int(q) for q in used_ids)
+    ):
+        errors.append('previously_used_ids must be a list of question ids')
+    
     # Validate sections if provided
     sections = data.get('sections', [])
     if sections:
@@ -233,4 +284,19 @@ def validate_paper_generation_params(data: dict) -> Tuple[bool, List[str]]:
             if not validate_positive_int(section.get('total_questions', 0)):
                 errors.append(f'Section {i+1}: total_questions must be positive')
     
+    return errors
+
+
+def validate_blueprint_params(data: dict) -> Tuple[bool, List[str]]:
+    """
+    Validate a blueprint for a feasibility dry-run (course, sections and
+    coverage targets only).
+    """
+    errors = []
+    
+    if not validate_positive_int(data.get('course_id')):
+        errors.append('course_id is required')
+    
+    errors.extend(_blueprint_errors(data))
+    
     return len(errors) == 0, errors